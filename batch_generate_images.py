@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Generate story images in one batch from the prompt catalog (prompt_catalog.py).
+
+Prompts are submitted to an HTTP image backend from an asyncio event loop:
+- one keep-alive connection pool, at most --concurrency requests in flight
+- a token bucket caps the request rate (--rate per second, --burst)
+- 429s, 5xx responses and connection errors are retried with exponential
+  backoff and jitter, honouring Retry-After
+- every request and result is appended to a JSONL journal (requests.jsonl),
+  so rerunning after an interruption only submits the prompts that have not
+  completed (or whose prompt text changed since)
+- prompts are streamed from the catalog shards, and only --concurrency of
+  them are in progress at a time, however large the catalog
+- every generated image is kept in the local image cache (image_cache.py),
+  and a prompt seen before is served from it without calling the backend
+
+The backend is called with an OpenAI-style body, {"prompt", "size", "n",
+"response_format": "b64_json"}, and may answer with either a JSON
+{"data": [{"b64_json": ...}]} or the raw image bytes. Images are re-encoded
+when the backend's format does not match the output filename.
+
+    python batch_generate_images.py --endpoint https://api.example.com/v1/images/generations
+    python batch_generate_images.py --serve-stub 8765 &
+    python batch_generate_images.py --endpoint http://127.0.0.1:8765/ --journal /tmp/j.jsonl
+
+The API key, if the backend needs one, is read from $STORYBOOK_IMAGE_API_KEY.
+Images are written over the placeholders in the same directory, and their
+build manifest entries are dropped, so later placeholder runs keep them.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import ssl
+import sys
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+from build_manifest import BuildManifest, manifest_path_for
+from content_writer import WriteStats, encode_image, write_if_changed
+from image_cache import ImageCache, cache_key
+from prompt_catalog import CATALOG_DIR, image_path, iter_images
+
+JOURNAL_PATH = "requests.jsonl"
+OUTPUT_DIR = "app/public/story-images"
+
+ENDPOINT_ENV = "STORYBOOK_IMAGE_ENDPOINT"
+API_KEY_ENV = "STORYBOOK_IMAGE_API_KEY"
+
+WIDTH, HEIGHT = 800, 600
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Output extension -> (PIL format, save params)
+FORMATS = {
+    ".jpg": ("JPEG", {"quality": 95}),
+    ".jpeg": ("JPEG", {"quality": 95}),
+    ".png": ("PNG", {}),
+    ".webp": ("WEBP", {"quality": 90}),
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date),
+    or None if it is missing or unparseable, so the computed backoff applies."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class ConnectionPool:
+    """Minimal HTTP/1.1 keep-alive client for a single host on asyncio streams."""
+
+    def __init__(self, url, size, timeout=120):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported endpoint scheme: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.host_header = parts.netloc
+        self.timeout = timeout
+        self.idle = []
+        self.limit = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def _connect(self):
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def request(self, method, headers, body=b""):
+        """Send one request. Returns (status, headers, body)."""
+        async with self.limit:
+            reader, writer = self.idle.pop() if self.idle else await self._connect()
+            try:
+                status, resp_headers, data, reusable = await asyncio.wait_for(
+                    self._exchange(reader, writer, method, headers, body), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            if reusable:
+                self.idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, resp_headers, data
+
+    async def _exchange(self, reader, writer, method, headers, body):
+        lines = [f"{method} {self.path} HTTP/1.1", f"Host: {self.host_header}",
+                 f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        status = int(status_line.split()[1])
+        resp_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            resp_headers[name.strip().lower()] = value.strip()
+
+        reusable = resp_headers.get("connection", "").lower() != "close"
+        if resp_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b"".join(chunks)
+        elif "content-length" in resp_headers:
+            data = await reader.readexactly(int(resp_headers["content-length"]))
+        else:
+            data = await reader.read()
+            reusable = False
+        return status, resp_headers, data, reusable
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def prompt_hash(item, size):
+    data = json.dumps({"prompt": item["prompt"], "size": size}, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class Journal:
+    """Append-only JSONL log of requests and results, read back on resume."""
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    # Ignore anything in the file that is not one of our records
+                    if not isinstance(record, dict) or record.get("event") != "result":
+                        continue
+                    if record.get("status") == "ok":
+                        self.completed[record["id"]] = record
+                    else:
+                        self.completed.pop(record.get("id"), None)
+        # Opened on the first record, so reading it (e.g. for --dry-run) creates nothing
+        self.file = None
+
+    def is_done(self, item, digest, output_path):
+        record = self.completed.get(item["id"])
+        return (record is not None and record.get("prompt_sha") == digest
+                and os.path.exists(output_path))
+
+    def log(self, event, **fields):
+        record = {"event": event, "ts": round(time.time(), 3), **fields}
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def decode_response(headers, body):
+    """Image bytes from either a raw image response or a b64_json payload."""
+    if headers.get("content-type", "").startswith("image/"):
+        return body
+    payload = json.loads(body)
+    entry = payload["data"][0]
+    if "b64_json" not in entry:
+        raise ValueError("backend response has no b64_json image data")
+    return base64.b64decode(entry["b64_json"])
+
+
+def to_output_format(data, filename):
+    """Re-encode data to match the filename's extension, if it does not already."""
+    format, params = FORMATS.get(os.path.splitext(filename)[1].lower(), (None, {}))
+    with Image.open(io.BytesIO(data)) as img:
+        if format is None or img.format == format:
+            return data
+        if format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        return encode_image(img, format, **params)
+
+
+class Generator:
+    def __init__(self, endpoint, args, journal, cache=None, manifest=None):
+        self.cache = cache
+        # Generated art replaces placeholders; their manifest entries are dropped
+        # so the placeholder generators keep the art instead of "rebuilding" it
+        self.manifest = manifest
+        self.pool = ConnectionPool(endpoint, args.concurrency, timeout=args.timeout)
+        self.bucket = TokenBucket(args.rate, args.burst)
+        self.journal = journal
+        self.args = args
+        self.size = f"{WIDTH}x{HEIGHT}"
+        self.stats = WriteStats()
+        self.failed = []
+        self.headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        api_key = os.environ.get(API_KEY_ENV)
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+    @staticmethod
+    def ext(item):
+        return os.path.splitext(item["filename"])[1].lower()
+
+    def cache_key(self, item):
+        return cache_key(item["prompt"], {"model": self.args.model, "size": self.size,
+                                          "format": self.ext(item)})
+
+    async def fetch(self, item, digest):
+        body = {"prompt": item["prompt"], "size": self.size, "n": 1,
+                "response_format": "b64_json"}
+        if self.args.model:
+            body["model"] = self.args.model
+        body = json.dumps(body).encode('utf-8')
+
+        for attempt in range(1, self.args.retries + 2):
+            await self.bucket.acquire()
+            self.journal.log("request", id=item["id"], prompt_sha=digest, attempt=attempt)
+            try:
+                status, headers, data = await self.pool.request("POST", self.headers, body)
+                if status == 200:
+                    return decode_response(headers, data)
+                raise HTTPError(status, data[:200].decode('utf-8', 'replace'),
+                                parse_retry_after(headers.get("retry-after")))
+            except (HTTPError, OSError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError) as e:
+                retryable = not isinstance(e, HTTPError) or e.status in RETRY_STATUSES
+                if not retryable or attempt > self.args.retries:
+                    raise
+                delay = min(self.args.max_backoff, self.args.backoff * 2 ** (attempt - 1))
+                delay = getattr(e, "retry_after", None) or random.uniform(delay / 2, delay)
+                print(f"  {item['filename']}: {e}; retrying in {delay:.1f}s", file=sys.stderr)
+                await asyncio.sleep(delay)
+
+    async def generate(self, item, output_dir):
+        output_path = image_path(output_dir, item["filename"], self.args.sharded)
+        digest = prompt_hash(item, self.size)
+        if self.journal.is_done(item, digest, output_path) and not self.args.force:
+            return "skipped"
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        key = self.cache_key(item)
+        start = time.perf_counter()
+        try:
+            status = None
+            if self.cache is not None:
+                status = await asyncio.to_thread(self.cache.materialize, key, output_path)
+            if status is not None:
+                self.stats.add(status)
+                self._forget(output_path)
+                self.journal.log("result", id=item["id"], prompt_sha=digest, status="ok",
+                                 output=item["filename"], cached=True)
+                print(f"{status.capitalize()}: {item['filename']} (cached)")
+                return status
+            data = await self.fetch(item, digest)
+            data = await asyncio.to_thread(to_output_format, data, item["filename"])
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, key, data, self.ext(item),
+                                        {"id": item["id"], "prompt": item["prompt"]})
+            status = self.stats.add(await asyncio.to_thread(write_if_changed, output_path, data))
+            self._forget(output_path)
+        except Exception as e:
+            self.journal.log("result", id=item["id"], prompt_sha=digest, status="failed",
+                             error=str(e))
+            self.failed.append(item["filename"])
+            print(f"Failed: {item['filename']}: {e}", file=sys.stderr)
+            return "failed"
+        seconds = time.perf_counter() - start
+        self.journal.log("result", id=item["id"], prompt_sha=digest, status="ok",
+                         output=item["filename"], bytes=len(data), seconds=round(seconds, 3))
+        print(f"{status.capitalize()}: {item['filename']} ({seconds:.1f}s)")
+        return status
+
+    def _forget(self, output_path):
+        if self.manifest is not None:
+            self.manifest.forget(output_path)
+
+    async def run(self, items, output_dir):
+        """Generate every item, pulling from the (possibly lazy) iterable only as
+        fast as the workers take them. Returns the list of statuses."""
+        items = iter(items)
+        results = []
+
+        async def worker():
+            # The event loop is single-threaded, so the workers can share the iterator
+            for item in items:
+                results.append(await self.generate(item, output_dir))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+            return results
+        finally:
+            self.pool.close()
+            if self.cache is not None:
+                self.cache.save()
+            if self.manifest is not None:
+                self.manifest.save()
+
+
+async def serve_stub(port, fail_rate=0.0, delay=0.0):
+    """Local stand-in for an image backend: answers every prompt with a flat-colour PNG.
+
+    fail_rate makes that fraction of requests return 503, to exercise retries.
+    """
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                body = await reader.readexactly(length)
+                if delay:
+                    await asyncio.sleep(delay)
+                if random.random() < fail_rate:
+                    status, payload = "503 Service Unavailable", b'{"error":"busy"}'
+                else:
+                    request = json.loads(body)
+                    size = tuple(int(n) for n in request.get("size", "800x600").split("x"))
+                    shade = hashlib.sha256(request["prompt"].encode('utf-8')).digest()[:3]
+                    buffer = io.BytesIO()
+                    Image.new("RGB", size, tuple(shade)).save(buffer, "PNG")
+                    b64 = base64.b64encode(buffer.getvalue()).decode('ascii')
+                    status, payload = "200 OK", json.dumps({"data": [{"b64_json": b64}]}).encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    print(f"Stub image backend listening on http://127.0.0.1:{port}/")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate story images from their prompts.")
+    parser.add_argument("--endpoint", default=os.environ.get(ENDPOINT_ENV),
+                        help=f"image generation URL (default: ${ENDPOINT_ENV})")
+    parser.add_argument("--model", default=None, help="model name to send to the backend")
+    parser.add_argument("--catalog", default=CATALOG_DIR,
+                        help="prompt catalog directory (see prompt_catalog.py)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--sharded", action="store_true",
+                        help="write images into id-prefix subdirectories of the output dir")
+    parser.add_argument("--journal", default=JOURNAL_PATH,
+                        help="JSONL log of requests and results, used to resume")
+    parser.add_argument("--only", default=None, help="comma-separated story ids")
+    parser.add_argument("-c", "--concurrency", type=int, default=8,
+                        help="maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=2.0,
+                        help="maximum requests per second (0 for no limit)")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--backoff", type=float, default=1.0,
+                        help="first retry delay in seconds, doubled on each retry")
+    parser.add_argument("--max-backoff", type=float, default=60.0)
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="seconds to wait for one response")
+    parser.add_argument("--force", action="store_true",
+                        help="regenerate images the journal says are done")
+    parser.add_argument("--cache-dir", default=None,
+                        help="generated-image cache (default: .image-cache)")
+    parser.add_argument("--cache-max-mb", type=float, default=None,
+                        help="evict least recently used cached images above this size")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always call the backend, and do not cache its images")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the prompts that would be submitted")
+    parser.add_argument("--serve-stub", type=int, metavar="PORT", default=None,
+                        help="run a local stub backend on PORT instead")
+    parser.add_argument("--stub-fail-rate", type=float, default=0.0)
+    parser.add_argument("--stub-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.serve_stub is not None:
+        try:
+            asyncio.run(serve_stub(args.serve_stub, args.stub_fail_rate, args.stub_delay))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if not os.path.isdir(args.catalog):
+        parser.error(f"no prompt catalog at {args.catalog}; run `python prompt_catalog.py build`")
+    # Only the shards holding the wanted ids are read
+    items = iter_images(args.catalog, set(args.only.split(",")) if args.only else None)
+
+    journal = Journal(args.journal)
+    try:
+        if args.dry_run:
+            size = f"{WIDTH}x{HEIGHT}"
+            for item in items:
+                path = image_path(args.output_dir, item["filename"], args.sharded)
+                if args.force or not journal.is_done(item, prompt_hash(item, size), path):
+                    print(f"Would generate: {item['filename']}")
+            return
+        if not args.endpoint:
+            parser.error(f"--endpoint (or ${ENDPOINT_ENV}) is required")
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        cache = None
+        if not args.no_cache:
+            cache = ImageCache(args.cache_dir)
+            if args.cache_max_mb is not None:
+                cache.max_bytes = int(args.cache_max_mb * 1024 ** 2)
+        manifest = BuildManifest(manifest_path_for(args.output_dir))
+        generator = Generator(args.endpoint, args, journal, cache, manifest)
+        start = time.perf_counter()
+        results = asyncio.run(generator.run(items, args.output_dir))
+    finally:
+        journal.close()
+
+    elapsed = time.perf_counter() - start
+    skipped = results.count("skipped")
+    print(f"\n{len(results) - skipped} submitted, {skipped} already done, "
+          f"{len(generator.failed)} failed in {elapsed:.1f}s "
+          f"({generator.pool.opened} connections; {generator.stats.summary()})")
+    if cache is not None:
+        print(f"Image cache: {cache.hits} hits, {cache.misses} misses")
+    if generator.failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Consonant blend classification with prefix and suffix tries.
+
+Every known blend is inserted into a prefix trie (initial blends such as
+BR, SCR, SQU) or a suffix trie (final blends such as ND, CK, ST). Classifying
+a word walks each trie once and keeps the longest blend that matched, so SCR
+wins over SC and STR over ST, in time proportional to the word length.
+
+This is what the blend MDX pages and blend tile themes are derived from, and
+it can ingest a large dictionary file in a single streaming pass:
+
+    python blend_trie.py words.txt            # summary of words per blend
+"""
+
+import argparse
+from collections import defaultdict
+
+INITIAL = "initial"
+FINAL = "final"
+
+# Tiles are flat colour plus anti-aliased letters, which a palette PNG stores
+# exactly and far smaller than JPEG
+TILE_EXT = ".png"
+
+# Blend -> image theme, per position
+INITIAL_BLENDS = {
+    "br": "r-blends", "cr": "r-blends", "dr": "r-blends", "fr": "r-blends",
+    "gr": "r-blends", "pr": "r-blends", "tr": "r-blends",
+    "sc": "s-blends", "sk": "s-blends", "sm": "s-blends", "sn": "s-blends",
+    "sp": "s-blends", "st": "s-blends", "sw": "s-blends", "scr": "s-blends",
+    "squ": "s-blends", "str": "s-blends", "spr": "s-blends", "spl": "s-blends",
+    "bl": "l-blends", "cl": "l-blends", "fl": "l-blends", "gl": "l-blends",
+    "pl": "l-blends", "sl": "l-blends",
+    "tw": "other", "qu": "other",
+}
+
+FINAL_BLENDS = {
+    blend: "final-blends" for blend in [
+        "ct", "ft", "lt", "nt", "pt", "st", "xt",
+        "ck", "ld", "lf", "lk", "lm", "lp", "mb", "mp", "nd", "nk",
+        "rd", "rf", "rk", "rl", "rm", "rn", "rt", "sk", "sp",
+    ]
+}
+
+_END = "$"
+
+
+def _build_trie(keys):
+    root = {}
+    for key in keys:
+        node = root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[_END] = key
+    return root
+
+
+def _longest_match(trie, chars, limit):
+    """Longest key in trie that is a prefix of chars, using at most limit chars."""
+    node = trie
+    best = None
+    for i, ch in enumerate(chars):
+        if i >= limit:
+            break
+        node = node.get(ch)
+        if node is None:
+            break
+        if _END in node:
+            best = node[_END]
+    return best
+
+
+class BlendClassifier:
+    """Assigns words to their initial and final consonant blends."""
+
+    def __init__(self, initial=INITIAL_BLENDS, final=FINAL_BLENDS):
+        self.initial = initial
+        self.final = final
+        self._prefixes = _build_trie(initial)
+        # Final blends are stored reversed and matched against the reversed word
+        self._suffixes = _build_trie(blend[::-1] for blend in final)
+
+    def classify(self, word):
+        """Return (initial blend or None, final blend or None) for word."""
+        w = word.strip().lower()
+        # A blend must be followed (or preceded) by at least one more letter
+        limit = len(w) - 1
+        initial = _longest_match(self._prefixes, w, limit)
+        final = _longest_match(self._suffixes, reversed(w), limit)
+        return initial, final[::-1] if final else None
+
+    def theme(self, blend, position=INITIAL):
+        """Image theme for a blend; falls back to 'other' for unknown blends."""
+        themes = self.initial if position == INITIAL else self.final
+        return themes.get(blend.lower(), "other")
+
+    def classify_stream(self, lines):
+        """Classify an iterable of words (e.g. an open dictionary file) in one pass.
+
+        Returns {(blend, position): set of words}.
+        """
+        groups = defaultdict(set)
+        for line in lines:
+            word = line.strip()
+            if not word or not word.isalpha():
+                continue
+            initial, final = self.classify(word)
+            if initial:
+                groups[(initial, INITIAL)].add(word)
+            if final:
+                groups[(final, FINAL)].add(word)
+        return groups
+
+
+def page_title(blend, position=INITIAL):
+    """Page title for a blend, e.g. 'BR Words' or 'Final ST Words'.
+
+    Final blends that share letters with an initial blend (ST, SK, SP) get a
+    'Final' prefix so both lists have their own page.
+    """
+    if position == FINAL and blend in INITIAL_BLENDS:
+        return f"Final {blend.upper()} Words"
+    return f"{blend.upper()} Words"
+
+
+def page_name(blend, position=INITIAL):
+    """File stem used for a blend's MDX page and tile image, e.g. 'final-st-words'."""
+    return page_title(blend, position).lower().replace(' ', '-')
+
+
+def all_pages():
+    """(blend, position) for every known blend page, initial blends first."""
+    return ([(blend, INITIAL) for blend in INITIAL_BLENDS] +
+            [(blend, FINAL) for blend in FINAL_BLENDS])
+
+
+def parse_page_name(name):
+    """Inverse of page_name: 'final-st-words' -> ('st', FINAL)."""
+    stem = name[:-len("-words")] if name.endswith("-words") else name
+    if stem.startswith("final-"):
+        return stem[len("final-"):], FINAL
+    if stem in INITIAL_BLENDS:
+        return stem, INITIAL
+    return stem, FINAL
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify a word list by consonant blend.")
+    parser.add_argument("words", help="word list, one word per line")
+    args = parser.parse_args()
+
+    classifier = BlendClassifier()
+    with open(args.words, 'r', encoding='utf-8') as f:
+        groups = classifier.classify_stream(f)
+    for blend, position in all_pages():
+        words = groups.get((blend, position), ())
+        print(f"{page_title(blend, position)}: {len(words)} words")
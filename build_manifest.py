@@ -0,0 +1,111 @@
+"""
+Incremental build manifest for generated images.
+
+Each output image is recorded with a hash of the inputs that produced it
+(title, theme, colors, dimensions, font file, renderer version). Generators
+ask the manifest whether an output is current and skip it if so, which keeps
+unchanged files - and their mtimes - untouched between runs.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+MANIFEST_PATH = "app/public/story-images.manifest.json"
+
+
+def manifest_path_for(output_dir):
+    """Manifest location for an output directory: a sibling file next to it."""
+    return f"{os.path.normpath(output_dir)}.manifest.json"
+
+
+def hash_inputs(inputs):
+    """Stable SHA-256 of a JSON-serialisable description of an image's inputs."""
+    data = json.dumps(inputs, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+@contextmanager
+def _locked(path):
+    """Exclusive lock so generators sharing a manifest can save concurrently."""
+    with open(f"{path}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class BuildManifest:
+    """Maps output paths (relative to the manifest) to the hash of their inputs."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.entries = _read(path)
+        self._changed = set()
+        self._removed = set()
+
+    def _key(self, output_path):
+        return os.path.relpath(output_path, os.path.dirname(os.path.abspath(self.path)))
+
+    def is_current(self, output_path, inputs):
+        """True if output_path exists and was built from exactly these inputs."""
+        key = self._key(os.path.abspath(output_path))
+        return os.path.exists(output_path) and self.entries.get(key) == hash_inputs(inputs)
+
+    def has_entry(self, output_path):
+        """True if output_path was built by a generator using this manifest.
+
+        Files without an entry (committed artwork, hand-made images) are not
+        ours to overwrite.
+        """
+        return self._key(os.path.abspath(output_path)) in self.entries
+
+    def record(self, output_path, inputs):
+        key = self._key(os.path.abspath(output_path))
+        digest = hash_inputs(inputs)
+        if self.entries.get(key) != digest:
+            self.entries[key] = digest
+            self._changed.add(key)
+
+    def forget(self, output_path):
+        """Drop output_path's entry: it is no longer a generated image (e.g. real
+        artwork replaced it), so generators must treat it as not theirs."""
+        key = self._key(os.path.abspath(output_path))
+        if key in self.entries:
+            del self.entries[key]
+            self._changed.discard(key)
+            self._removed.add(key)
+
+    def save(self):
+        """Merge this run's changes into the manifest on disk, if there are any.
+
+        Several generators share one manifest and may run at the same time, so
+        only the entries recorded here are written over the current file.
+        """
+        if not self._changed and not self._removed:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with _locked(self.path):
+            entries = _read(self.path)
+            entries.update({key: self.entries[key] for key in self._changed})
+            for key in self._removed:
+                entries.pop(key, None)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+                f.write('\n')
+            os.replace(tmp_path, self.path)
+        self.entries = entries
+        self._changed.clear()
+        self._removed.clear()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Compile every story and blend page into one memory-mappable bundle file.
+
+Readers map the file and find an entry by slug with a single hash-table probe,
+then slice its pre-parsed front-matter (JSON) and MDX body straight out of the
+mapping: no directory listing, no per-file opens, no YAML parsing.
+
+Layout (all integers little-endian):
+
+    header  32 bytes   magic "SBBUNDLE", version u32, entry count u32,
+                       table offset u64, table slot count u64
+    data               for each entry: slug, front-matter JSON, body (UTF-8)
+    table   48 bytes   per slot, open addressing with linear probing:
+                       FNV-1a 64 hash of the slug u64, slug offset u64,
+                       slug length u32, front-matter length u32,
+                       front-matter offset u64, body offset u64,
+                       body length u32, reserved u32
+
+Empty slots have a slug length of 0. The slot count is a power of two at least
+twice the entry count, so a probe is expected to touch one or two slots.
+Slugs are "<collection>/<path without .mdx>", e.g. "stories/small/001" or
+"consonant-blends/bl-words".
+
+    python content_bundle.py build
+    python content_bundle.py get stories/small/001
+    python content_bundle.py list
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+from pathlib import Path
+
+from content_writer import write_if_changed
+from frontmatter import split_front_matter
+
+CONTENT_DIR = "app/public/content"
+BUNDLE_PATH = "app/public/content/content.bundle"
+COLLECTIONS = ("stories", "consonant-blends")
+
+MAGIC = b"SBBUNDLE"
+VERSION = 1
+
+HEADER = struct.Struct("<8sIIQQ")
+SLOT = struct.Struct("<QQIIQQII")
+
+FNV_OFFSET = 0xcbf29ce484222325
+FNV_PRIME = 0x100000001b3
+
+
+def fnv1a64(data):
+    h = FNV_OFFSET
+    for byte in data:
+        h = ((h ^ byte) * FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+
+def collect_entries(content_dir=CONTENT_DIR, collections=COLLECTIONS):
+    """Yield (slug, front-matter dict, body) for every MDX file, sorted by slug."""
+    content_dir = Path(content_dir)
+    for collection in collections:
+        root = content_dir / collection
+        for path in sorted(root.rglob('*.mdx')):
+            data, body = split_front_matter(path.read_text(encoding='utf-8'))
+            slug = f"{collection}/{path.relative_to(root).with_suffix('').as_posix()}"
+            yield slug, data, body
+
+
+def compile_bundle(entries):
+    """Serialise (slug, front-matter, body) entries into bundle bytes."""
+    entries = list(entries)
+    slot_count = 1
+    while slot_count < max(1, 2 * len(entries)):
+        slot_count *= 2
+
+    data = bytearray()
+    offset = HEADER.size
+    slots = [None] * slot_count
+    for slug, meta, body in entries:
+        key = slug.encode('utf-8')
+        meta_bytes = json.dumps(meta, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        body_bytes = body.encode('utf-8')
+        key_off = offset + len(data)
+        data += key
+        meta_off = offset + len(data)
+        data += meta_bytes
+        body_off = offset + len(data)
+        data += body_bytes
+
+        h = fnv1a64(key)
+        i = h & (slot_count - 1)
+        while slots[i] is not None:
+            other = slots[i][1] - offset
+            if data[other:other + slots[i][2]] == key:
+                raise ValueError(f"Duplicate slug in bundle: {slug}")
+            i = (i + 1) & (slot_count - 1)
+        slots[i] = (h, key_off, len(key), len(meta_bytes), meta_off, body_off,
+                    len(body_bytes), 0)
+
+    # Keep the table 8-byte aligned
+    data += b"\0" * (-(offset + len(data)) % 8)
+    table_offset = offset + len(data)
+    table = b"".join(SLOT.pack(*slot) if slot else bytes(SLOT.size) for slot in slots)
+    header = HEADER.pack(MAGIC, VERSION, len(entries), table_offset, slot_count)
+    return header + bytes(data) + table
+
+
+class ContentBundle:
+    """Read-only view of a compiled bundle with O(1) lookup by slug."""
+
+    def __init__(self, path=BUNDLE_PATH):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self._table, self._slots = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} content bundle")
+
+    def _slot(self, slug):
+        key = slug.encode('utf-8')
+        h = fnv1a64(key)
+        mask = self._slots - 1
+        i = h & mask
+        while True:
+            slot = SLOT.unpack_from(self._map, self._table + i * SLOT.size)
+            if slot[2] == 0:
+                return None
+            if slot[0] == h and self._map[slot[1]:slot[1] + slot[2]] == key:
+                return slot
+            i = (i + 1) & mask
+
+    def __contains__(self, slug):
+        return self._slot(slug) is not None
+
+    def __len__(self):
+        return self.count
+
+    def meta(self, slug):
+        """Pre-parsed front-matter of an entry."""
+        slot = self._slot(slug)
+        if slot is None:
+            raise KeyError(slug)
+        return json.loads(self._map[slot[4]:slot[4] + slot[3]])
+
+    def body(self, slug):
+        """MDX body of an entry, without its front-matter."""
+        slot = self._slot(slug)
+        if slot is None:
+            raise KeyError(slug)
+        return self._map[slot[5]:slot[5] + slot[6]].decode('utf-8')
+
+    def get(self, slug):
+        """(front-matter, body) for slug."""
+        return self.meta(slug), self.body(slug)
+
+    def slugs(self, collection=None):
+        """Every slug in the bundle (optionally one collection's), sorted."""
+        found = []
+        for i in range(self._slots):
+            slot = SLOT.unpack_from(self._map, self._table + i * SLOT.size)
+            if slot[2]:
+                found.append(self._map[slot[1]:slot[1] + slot[2]].decode('utf-8'))
+        if collection:
+            found = [slug for slug in found if slug.startswith(f"{collection}/")]
+        return sorted(found)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or read the compiled content bundle.")
+    parser.add_argument("--bundle", default=BUNDLE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="compile stories and blend pages into the bundle")
+    build.add_argument("--content-dir", default=CONTENT_DIR)
+    get = sub.add_parser("get", help="print one entry")
+    get.add_argument("slug")
+    listing = sub.add_parser("list", help="list the slugs in the bundle")
+    listing.add_argument("--collection", default=None)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        data = compile_bundle(collect_entries(args.content_dir))
+        status = write_if_changed(args.bundle, data)
+        with ContentBundle(args.bundle) as bundle:
+            print(f"{status.capitalize()} {args.bundle}: {len(bundle)} entries, "
+                  f"{len(data):,} bytes")
+        return
+
+    with ContentBundle(args.bundle) as bundle:
+        if args.command == "get":
+            try:
+                meta, body = bundle.get(args.slug)
+            except KeyError:
+                sys.exit(f"No entry for {args.slug}")
+            print(json.dumps(meta, indent=2))
+            print(body)
+        else:
+            for slug in bundle.slugs(args.collection):
+                print(slug)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Idempotent, atomic file writes for the content and image generators.
+
+write_if_changed() compares the new bytes against what is already on disk and
+only writes real changes, so untouched files keep their mtimes and do not
+invalidate Next's build cache or the CDN. Writes go to a temp file in the same
+directory that is then renamed over the target, so a concurrently running
+dev server never sees a half-written file.
+"""
+
+import io
+import os
+import stat
+import tempfile
+
+from tracing import span
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+# Read once at import: os.umask can only be queried by setting it, which is
+# not safe to do from the writer threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_if_changed(path, data):
+    """Atomically write data (bytes or str) to path if it differs. Returns the status."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    try:
+        existing = os.stat(path)
+    except FileNotFoundError:
+        existing = None
+    if existing is not None and existing.st_size == len(data):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return UNCHANGED
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        if existing is not None:
+            mode = stat.S_IMODE(existing.st_mode)
+        else:
+            # mkstemp creates 0600 files; give new files the usual umask-based mode
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return CREATED if existing is None else UPDATED
+
+
+def encode_image(img, format, **params):
+    """Encode a PIL image to bytes in memory."""
+    with span("encode", format=format):
+        buffer = io.BytesIO()
+        img.save(buffer, format, **params)
+        return buffer.getvalue()
+
+
+def save_image(img, path, format, **params):
+    """Encode img and write it with write_if_changed. Returns the status."""
+    data = encode_image(img, format, **params)
+    with span("write", path=path):
+        return write_if_changed(path, data)
+
+
+class WriteStats:
+    """Counts created/updated/unchanged writes for an end-of-run summary."""
+
+    def __init__(self):
+        self.counts = {CREATED: 0, UPDATED: 0, UNCHANGED: 0}
+
+    def add(self, status):
+        self.counts[status] += 1
+        return status
+
+    def write(self, path, data):
+        return self.add(write_if_changed(path, data))
+
+    def save_image(self, img, path, format, **params):
+        return self.add(save_image(img, path, format, **params))
+
+    def summary(self):
+        return ", ".join(f"{count} {status}" for status, count in self.counts.items())
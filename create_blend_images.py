@@ -1,18 +1,19 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageChops, ImageDraw
+import argparse
+import json
 import os
 
-# List of blend file names (derived from the MDX script)
-blend_filenames = [
-    "br-words", "cr-words", "dr-words", "fr-words", "gr-words", "pr-words", "tr-words",
-    "sc-words", "sk-words", "sm-words", "sn-words", "sp-words", "st-words", "sw-words",
-    "scr-words", "squ-words", "str-words", "spr-words", "spl-words",
-    "bl-words", "cl-words", "fl-words", "gl-words", "pl-words", "sl-words",
-    "ct-words", "ft-words", "lt-words", "nt-words", "pt-words", "xt-words",
-    "tw-words", "qu-words", "ck-words", "ld-words", "lf-words", "lk-words",
-    "lm-words", "lp-words", "mb-words", "mp-words", "nd-words", "nk-words",
-    "rd-words", "rf-words", "rk-words", "rl-words", "rm-words", "rn-words",
-    "rt-words"
-]
+from blend_trie import TILE_EXT, BlendClassifier, all_pages, page_name, parse_page_name
+from build_manifest import BuildManifest, manifest_path_for
+from content_writer import WriteStats
+from font_registry import font_id
+from image_writer import ImageWriter
+from text_layout import draw_layout, fit_text
+import tracing
+from tracing import span
+
+# One tile per blend page (see blend_trie.page_name)
+blend_filenames = [page_name(blend, position) for blend, position in all_pages()]
 
 # Define color themes
 color_themes = {
@@ -23,50 +24,240 @@ color_themes = {
     "other": {"bg": (204, 153, 255), "text": (255, 255, 255)},
 }
 
+classifier = BlendClassifier()
+
+
 def get_theme(filename):
-    if any(c in filename for c in ['br','cr','dr','fr','gr','pr','tr']):
-        return "r-blends"
-    if any(c in filename for c in ['sc','sk','sm','sn','sp','st','sw','scr','squ','str','spr','spl']):
-        return "s-blends"
-    if any(c in filename for c in ['bl','cl','fl','gl','pl','sl']):
-        return "l-blends"
-    if any(c in filename for c in ['ct','ft','lt','nt','pt','xt','ck','ld','lf','lk','lm','lp','mb','mp','nd','nk','rd','rf','rk','rl','rm','rn','rt']):
-        return "final-blends"
-    return "other"
+    blend, position = parse_page_name(filename)
+    return classifier.theme(blend, position)
+
+
+def tile_text(name):
+    return parse_page_name(name)[0].upper()
 
 
 output_dir = "app/public/story-images"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
 
-for name in blend_filenames:
-    image_filename = f"{name}.jpg"
-    filepath = os.path.join(output_dir, image_filename)
+FONT_SIZE = 200
+
+WIDTH, HEIGHT = 800, 600
 
-    width, height = 800, 600
+# Bump whenever the drawing code changes so existing outputs are rebuilt
+RENDERER_VERSION = 3
+
+TILE_FORMAT = "PNG"
+
+# Sprite sheets for --atlas: blend-atlas-0.png, ... plus blend-atlas.json
+ATLAS_NAME = "blend-atlas"
+ATLAS_FORMAT = "PNG"
+ATLAS_TILE_SIZE = (200, 150)
+ATLAS_MAX_SHEET_SIZE = (2048, 2048)
+
+
+def blend_inputs(name):
+    """Everything that affects a blend tile, for the build manifest."""
     theme_name = get_theme(name)
-    colors = color_themes[theme_name]
-    
-    img = Image.new('RGB', (width, height), color=colors['bg'])
-    
-    try:
-        font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 200)
-    except IOError:
-        font = ImageFont.load_default()
+    return {
+        "text": tile_text(name),
+        "theme": theme_name,
+        "colors": color_themes[theme_name],
+        "size": [WIDTH, HEIGHT],
+        "font": font_id(),
+        "font_size": FONT_SIZE,
+        "renderer": RENDERER_VERSION,
+    }
 
-    draw = ImageDraw.Draw(img)
-    
-    text = name.split('-')[0].upper()
+
+def render_blend(name, size=(WIDTH, HEIGHT)):
+    """Draw the tile for one blend and return the image."""
+    width, height = size
+    # Smaller tiles (for the atlas) scale the text and margins with the height
+    scale = height / HEIGHT
+    theme_name = get_theme(name)
+    colors = color_themes[theme_name]
     
-    bbox = draw.textbbox((0, 0), text, font=font)
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
+    with span("background", theme=theme_name):
+        img = Image.new('RGB', (width, height), color=colors['bg'])
+        draw = ImageDraw.Draw(img)
     
-    position = ((width - text_width) / 2, (height - text_height) / 2)
+    text = tile_text(name)
     
-    draw.text(position, text, fill=colors['text'], font=font)
+    with span("text_measure"):
+        margin = round(40 * scale)
+        font_size = round(FONT_SIZE * scale)
+        layout = fit_text(text, (margin, 0, width - margin, height), font_size, font_size // 2)
     
-    img.save(filepath, 'JPEG')
-    print(f"Created {image_filename}")
+    with span("draw_text"):
+        draw_layout(draw, layout, fill=colors['text'])
+    return img
+
+
+def tile_filename(name):
+    return f"{name}{TILE_EXT}"
+
+
+def render_tile(name):
+    """The tile for one blend, ready to save as TILE_FORMAT.
+
+    A tile has one background colour plus the anti-aliased shades of its
+    letters, normally well under 256 colours, so it becomes a palette image
+    that holds every one exactly. A tile with more colours stays RGB rather
+    than being quantized lossily.
+    """
+    img = render_blend(name)
+    colors = img.getcolors(256)
+    if colors is None:
+        return img
+    palette = img.quantize(len(colors), method=Image.Quantize.MEDIANCUT)
+    # quantize() may merge colours even when there are few enough; keep it only if exact
+    if ImageChops.difference(img, palette.convert('RGB')).getbbox() is not None:
+        return img
+    return palette
+
+
+def atlas_inputs(names, tile_size, max_sheet_size):
+    """Everything that affects the atlas sheets and their JSON, for the build manifest."""
+    return {
+        "tiles": {name: blend_inputs(name) for name in names},
+        "tile_size": list(tile_size),
+        "max_sheet_size": list(max_sheet_size),
+        "format": ATLAS_FORMAT,
+    }
+
+
+def pack_atlas(names, tile_size, max_sheet_size):
+    """Place equal-sized tiles on a grid, row by row, filling as many sheets as needed.
+
+    Returns the atlas manifest: sheet file names and sizes, and each tile's sheet
+    and pixel offset.
+    """
+    tile_w, tile_h = tile_size
+    columns = max(1, max_sheet_size[0] // tile_w)
+    rows = max(1, max_sheet_size[1] // tile_h)
+    per_sheet = columns * rows
+    sheets = []
+    tiles = {}
+    for start in range(0, len(names), per_sheet):
+        chunk = names[start:start + per_sheet]
+        sheet_columns = min(columns, len(chunk))
+        sheet_rows = -(-len(chunk) // columns)
+        sheet = {
+            "file": f"{ATLAS_NAME}-{len(sheets)}.{ATLAS_FORMAT.lower()}",
+            "width": sheet_columns * tile_w,
+            "height": sheet_rows * tile_h,
+        }
+        for i, name in enumerate(chunk):
+            x, y = (i % columns) * tile_w, (i // columns) * tile_h
+            tiles[name] = {
+                "sheet": len(sheets),
+                "x": x,
+                "y": y,
+                "width": tile_w,
+                "height": tile_h,
+                # Ready to use as a CSS background-position on the sheet
+                "backgroundPosition": f"{-x}px {-y}px",
+            }
+        sheets.append(sheet)
+    return {"tileSize": [tile_w, tile_h], "sheets": sheets, "tiles": tiles}
+
+
+def create_atlas(names, output_dir, tile_size, max_sheet_size, manifest, stats,
+                 force=False, dry_run=False):
+    """Render every tile at tile_size into sprite sheets plus a JSON manifest."""
+    json_path = os.path.join(output_dir, f"{ATLAS_NAME}.json")
+    inputs = atlas_inputs(names, tile_size, max_sheet_size)
+    if not force and manifest.is_current(json_path, inputs):
+        print("Blend atlas unchanged")
+        return
+    atlas = pack_atlas(names, tile_size, max_sheet_size)
+    if dry_run:
+        print(f"Would create {len(atlas['sheets'])} atlas sheet(s) and {json_path}")
+        return
+
+    sheets = [Image.new('RGB', (sheet["width"], sheet["height"])) for sheet in atlas["sheets"]]
+    for name in names:
+        tile = atlas["tiles"][name]
+        sheets[tile["sheet"]].paste(render_blend(name, tile_size), (tile["x"], tile["y"]))
+    for sheet, img in zip(atlas["sheets"], sheets):
+        # Flat colours and anti-aliased letters fit a 256-colour palette
+        img = img.quantize(256, method=Image.Quantize.MEDIANCUT)
+        path = os.path.join(output_dir, sheet["file"])
+        print(f"{stats.save_image(img, path, ATLAS_FORMAT, optimize=True).capitalize()} {path}")
+    status = stats.write(json_path, json.dumps(atlas, indent=2) + '\n')
+    print(f"{status.capitalize()} {json_path}")
+    manifest.record(json_path, inputs)
+
+
+def parse_size(value):
+    width, _, height = value.partition("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create consonant blend tile images.")
+    parser.add_argument("--output-dir", default=output_dir)
+    parser.add_argument("--manifest", default=None,
+                        help="build manifest path (default: alongside the output directory)")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every tile even if its inputs are unchanged")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the tiles that would be rebuilt and exit")
+    parser.add_argument("--atlas", action="store_true",
+                        help="pack every tile into sprite sheets plus blend-atlas.json "
+                             "instead of writing one image per blend")
+    parser.add_argument("--tile-size", type=parse_size, default=ATLAS_TILE_SIZE,
+                        metavar="WxH", help="size of each tile in the atlas (default: 200x150)")
+    parser.add_argument("--max-sheet-size", type=parse_size, default=ATLAS_MAX_SHEET_SIZE,
+                        metavar="WxH", help="largest sprite sheet to emit (default: 2048x2048)")
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    tracing.start(args)
+
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    manifest = BuildManifest(args.manifest or manifest_path_for(args.output_dir))
+    unchanged = 0
+    stats = WriteStats()
+
+    if args.atlas:
+        create_atlas(blend_filenames, args.output_dir, args.tile_size, args.max_sheet_size,
+                     manifest, stats, args.force, args.dry_run)
+        tracing.finish(args)
+        if not args.dry_run:
+            manifest.save()
+            print(f"\nDone creating blend atlas ({stats.summary()}).")
+        return
+
+    def written(filepath, status, inputs):
+        manifest.record(filepath, inputs)
+        print(f"{status.capitalize()} {os.path.basename(filepath)}")
+
+    # Tiles are encoded and written in the background while the next ones render
+    with ImageWriter(stats=stats) as writer:
+        for name in blend_filenames:
+            image_filename = tile_filename(name)
+            filepath = os.path.join(args.output_dir, image_filename)
+
+            inputs = blend_inputs(name)
+            if not args.force and manifest.is_current(filepath, inputs):
+                unchanged += 1
+                continue
+            if args.dry_run:
+                print(f"Would create {image_filename}")
+                continue
+
+            img = render_tile(name)
+            writer.submit(img, filepath, TILE_FORMAT, optimize=True,
+                          on_done=lambda path, status, inputs=inputs: written(path, status, inputs))
+
+    if unchanged:
+        print(f"{unchanged} blend images unchanged")
+    tracing.finish(args)
+    if not args.dry_run:
+        manifest.save()
+        print(f"\nDone creating blend images ({stats.summary()}).")
+
 
-print("\\nDone creating blend images.") 
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
+import argparse
 import os
 
+from blend_trie import FINAL, INITIAL, TILE_EXT, BlendClassifier, all_pages, page_name, page_title
+from content_writer import UNCHANGED, WriteStats
+
 # The user-provided text with consonant blends
 data = """
 # Consonant Blends Word Lists
@@ -177,38 +181,94 @@ clasp, crisp, gasp, grasp, lisp, wasp, wisp
 """
 
 output_dir = "app/public/content/consonant-blends"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-lines = data.strip().split('\n')
-i = 0
-while i < len(lines):
-    line = lines[i]
-    if line.startswith('###'):
-        title = line.strip().replace('### ', '')
-        filename_title = title.lower().replace(' ', '-')
-        filename = f"{filename_title}.mdx"
-        
-        # The next line should be the words
-        i += 1
-        if i < len(lines):
-            words_line = lines[i].strip()
-            if words_line:
-                # Create MDX content
-                mdx_content = f"""---
+
+
+def render_page(title, words_line):
+    """MDX source for one blend page."""
+    filename_title = title.lower().replace(' ', '-')
+    return f"""---
 id: "{filename_title}"
 title: "{title}"
-img: "{filename_title}.jpg"
+img: "{filename_title}{TILE_EXT}"
 ---
 
 # {title}
 
 {words_line}
 """
-                # Write to file
-                with open(os.path.join(output_dir, filename), 'w') as f:
-                    f.write(mdx_content)
-                print(f"Created {filename}")
-    i += 1
 
-print("\nDone creating MDX files.") 
\ No newline at end of file
+
+def build_pages(data):
+    """Parse the hand-maintained word lists into {filename: mdx_content}."""
+    pages = {}
+    position = INITIAL
+    lines = data.strip().split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith('## '):
+            position = FINAL if 'Final' in line else INITIAL
+        elif line.startswith('###'):
+            heading = line.strip().replace('### ', '')
+            blend = heading.split()[0].lower()
+            # Final ST/SK/SP get their own page instead of replacing the initial one
+            title = page_title(blend, position)
+            filename = f"{page_name(blend, position)}.mdx"
+            
+            # The next line should be the words
+            i += 1
+            if i < len(lines):
+                words_line = lines[i].strip()
+                if words_line:
+                    if filename in pages:
+                        print(f"Warning: {title} is listed more than once; using the last list")
+                    pages[filename] = render_page(title, words_line)
+        i += 1
+    return pages
+
+
+def build_pages_from_words(lines, max_words=None):
+    """Classify a word list (one word per line) into {filename: mdx_content}."""
+    groups = BlendClassifier().classify_stream(lines)
+    pages = {}
+    for blend, position in all_pages():
+        words = sorted(groups.get((blend, position), ()), key=str.lower)
+        if not words:
+            continue
+        if max_words:
+            words = words[:max_words]
+        pages[f"{page_name(blend, position)}.mdx"] = render_page(
+            page_title(blend, position), ", ".join(words))
+    return pages
+
+
+def write_pages(pages, output_dir):
+    """Write every page that changed. Returns the WriteStats."""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    stats = WriteStats()
+    for filename, mdx_content in pages.items():
+        status = stats.write(os.path.join(output_dir, filename), mdx_content)
+        if status != UNCHANGED:
+            print(f"{status.capitalize()} {filename}")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create the consonant blend MDX pages.")
+    parser.add_argument("--words", default=None,
+                        help="build pages by classifying this word list (one word per line) "
+                             "instead of the built-in lists")
+    parser.add_argument("--max-words", type=int, default=None,
+                        help="cap the number of words per page when using --words")
+    parser.add_argument("--output-dir", default=output_dir)
+    args = parser.parse_args()
+
+    if args.words:
+        with open(args.words, 'r', encoding='utf-8') as f:
+            pages = build_pages_from_words(f, args.max_words)
+    else:
+        pages = build_pages(data)
+    stats = write_pages(pages, args.output_dir)
+    print(f"\nDone creating MDX files ({stats.summary()}).")
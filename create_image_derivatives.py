@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Create responsive derivatives of every image in app/public/story-images.
+
+Each source image gets a few width tiers (200/400/800 by default) encoded as
+WebP and, when Pillow has AVIF support, AVIF. Variants go to
+story-images/derived/ and srcset.json maps each source image to its variants
+and their byte sizes so the app can emit srcset attributes.
+
+Sources are found in subdirectories too (the --sharded layout of the
+generators), and keyed by their path relative to the source directory.
+Variant names keep the source extension (009.jpg -> derived/009-jpg-200.webp)
+so 009.jpg and 009.png never overwrite each other's variants; variants no
+source refers to any more are removed.
+
+Sources whose bytes and settings are unchanged since the last run are
+skipped.
+"""
+
+from PIL import Image, features
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from build_manifest import hash_inputs
+from content_writer import encode_image, write_if_changed
+
+source_dir = "app/public/story-images"
+
+WIDTHS = (200, 400, 800)
+
+# Encoder settings per format; AVIF is only used when Pillow supports it
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "avif": {"format": "AVIF", "quality": 50},
+}
+
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Bump whenever the resize/encode code changes so every variant is rebuilt
+RENDERER_VERSION = 3
+
+
+def available_formats(requested):
+    formats = []
+    for name in requested:
+        if name == "avif" and not features.check("avif"):
+            print("Warning: this Pillow build has no AVIF support; skipping AVIF variants",
+                  file=sys.stderr)
+            continue
+        formats.append(name)
+    return formats
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_inputs(path, widths, formats):
+    """Everything that affects a source's variants, for skipping unchanged ones."""
+    return {
+        "source": file_hash(path),
+        "widths": list(widths),
+        "formats": {name: FORMATS[name] for name in formats},
+        "renderer": RENDERER_VERSION,
+    }
+
+
+def variant_stem(name):
+    """Derived file stem for a source path relative to the source dir: 000/051.jpg -> 000/051-jpg."""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}-{ext.lstrip('.').lower()}"
+
+
+def create_variants(source_path, name, derived_dir, widths, formats):
+    """Resize and encode one source image. Returns its srcset.json entry."""
+    stem = variant_stem(name)
+    with Image.open(source_path) as img:
+        img.load()
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA")
+                          else "RGB")
+
+    variants = []
+    # Never upscale: tiers wider than the source are dropped, and a source
+    # narrower than every tier gets a single variant at its own width
+    tiers = [w for w in widths if w <= img.width] or [img.width]
+    for width in tiers:
+        height = round(img.height * width / img.width)
+        resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+        for fmt_name in formats:
+            settings = dict(FORMATS[fmt_name])
+            fmt = settings.pop("format")
+            filename = f"{stem}-{width}.{fmt_name}"
+            data = encode_image(resized, fmt, **settings)
+            path = os.path.join(derived_dir, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_if_changed(path, data)
+            variants.append({
+                "src": f"derived/{filename}",
+                "width": width,
+                "height": height,
+                "format": fmt_name,
+                "bytes": len(data),
+            })
+
+    return {
+        "width": img.width,
+        "height": img.height,
+        "bytes": os.path.getsize(source_path),
+        "variants": variants,
+    }
+
+
+def _create_job(job):
+    name, source_path, derived_dir, widths, formats = job
+    return name, create_variants(source_path, name, derived_dir, widths, formats)
+
+
+def find_sources(source_dir):
+    """Source image paths relative to source_dir (posix), skipping derived/."""
+    sources = []
+    for root, dirs, files in os.walk(source_dir):
+        if root == source_dir:
+            dirs[:] = [d for d in dirs if d != "derived"]
+        for name in files:
+            if name.lower().endswith(SOURCE_EXTENSIONS):
+                sources.append(os.path.relpath(os.path.join(root, name), source_dir)
+                               .replace(os.sep, '/'))
+    return sorted(sources)
+
+
+def remove_orphans(derived_dir, manifest):
+    """Delete variants that no srcset.json entry refers to. Returns how many."""
+    wanted = {os.path.normpath(os.path.join(os.path.dirname(derived_dir), v["src"]))
+              for entry in manifest.values() for v in entry["variants"]}
+    removed = 0
+    for root, _, files in os.walk(derived_dir):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if name != "srcset.json" and path not in wanted:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def create_all(source_dir, widths=WIDTHS, formats=("webp", "avif"), workers=1,
+               force=False, dry_run=False):
+    """Build variants for every changed source and rewrite srcset.json."""
+    derived_dir = os.path.join(source_dir, "derived")
+    manifest_path = os.path.join(derived_dir, "srcset.json")
+    os.makedirs(derived_dir, exist_ok=True)
+    formats = available_formats(formats)
+
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    sources = find_sources(source_dir)
+    jobs = []
+    hashes = {}
+    for name in sources:
+        path = os.path.join(source_dir, name)
+        hashes[name] = hash_inputs(source_inputs(path, widths, formats))
+        entry = manifest.get(name)
+        if (not force and entry and entry.get("hash") == hashes[name] and
+                all(os.path.exists(os.path.join(source_dir, v["src"])) for v in entry["variants"])):
+            continue
+        jobs.append((name, path, derived_dir, widths, formats))
+
+    print(f"{len(sources) - len(jobs)} sources unchanged, {len(jobs)} to process")
+    if dry_run:
+        for name, *_ in jobs:
+            print(f"Would create variants for {name}")
+        return manifest
+
+    if workers <= 1 or len(jobs) <= 1:
+        _record_results(map(_create_job, jobs), manifest, hashes)
+    else:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            _record_results(pool.map(_create_job, jobs, chunksize=chunksize), manifest, hashes)
+
+    # Drop entries for sources that no longer exist
+    manifest = {name: manifest[name] for name in sources if name in manifest}
+    write_if_changed(manifest_path, json.dumps(manifest, indent=2, sort_keys=True) + '\n')
+    removed = remove_orphans(derived_dir, manifest)
+    if removed:
+        print(f"Removed {removed} variants of deleted or renamed sources")
+    return manifest
+
+
+def _record_results(results, manifest, hashes):
+    for name, entry in results:
+        entry["hash"] = hashes[name]
+        manifest[name] = entry
+        print(f"Created {len(entry['variants'])} variants for {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create responsive WebP/AVIF image variants.")
+    parser.add_argument("--source-dir", default=source_dir)
+    parser.add_argument("--widths", default=",".join(str(w) for w in WIDTHS),
+                        help="comma-separated width tiers in pixels")
+    parser.add_argument("--formats", default="webp,avif",
+                        help="comma-separated output formats (webp, avif)")
+    parser.add_argument("-j", "--workers", type=int, default=0,
+                        help="number of processes (0 = one per CPU core)")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild variants even for unchanged sources")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the sources that would be processed and exit")
+    args = parser.parse_args()
+
+    widths = tuple(sorted(int(w) for w in args.widths.split(",")))
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    manifest = create_all(args.source_dir, widths, formats, args.workers or os.cpu_count() or 1,
+                          args.force, args.dry_run)
+    if not args.dry_run:
+        original = sum(entry["bytes"] for entry in manifest.values())
+        print(f"\nDone. {len(manifest)} images, {original} bytes of originals.")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,22 @@ Create themed placeholder images for stories using PIL.
 These will have appropriate colors and text for each story theme.
 """
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import argparse
 import os
-import json
 
-# Load story data
-with open('story_image_prompts.json', 'r') as f:
-    stories = json.load(f)
+from build_manifest import BuildManifest, manifest_path_for
+from content_writer import WriteStats, save_image
+from font_registry import font_id, get_font
+from image_writer import ImageWriter
+from optimize_images import PHOTO_JPEG
+from prompt_catalog import CATALOG_DIR, image_path, iter_images
+from scene_renderer import SCENES_PATH, load_scenes
+from text_layout import draw_layout, fit_text, metrics_for
+import tracing
+from tracing import span
 
 # Define color themes for different story types
 color_themes = {
@@ -58,7 +67,11 @@ color_themes = {
 
 # Map stories to themes
 def get_theme(story_id):
-    id_num = int(story_id)
+    try:
+        id_num = int(story_id)
+    except ValueError:
+        # Catalog ids are image stems, which need not be numbers
+        return "learning"
     if 1 <= id_num <= 10:
         return "minecraft"
     elif 11 <= id_num <= 20:
@@ -76,32 +89,45 @@ def get_theme(story_id):
     else:  # Learning activities
         return "learning"
 
-# Create placeholder images
-output_dir = "/Users/pmbp/Documents/Code/storybook/app/public/story-images"
 
-for story in stories:
-    filename = os.path.join(output_dir, story['filename'])
-    
-    # Skip if file already exists (001-006.jpg)
-    if os.path.exists(filename) and int(story['id']) <= 6:
-        print(f"Skipping {filename} - already exists")
-        continue
-    
-    # Create image
-    width, height = 800, 600
-    theme = get_theme(story['id'])
+output_dir = "app/public/story-images"
+
+WIDTH, HEIGHT = 800, 600
+
+# Bump whenever the drawing code changes so existing outputs are rebuilt
+RENDERER_VERSION = 2
+
+# Encoded as optimize_images.py encodes photographic art, since it leaves
+# generated images alone (less than half the bytes of quality 95)
+JPEG_PARAMS = PHOTO_JPEG
+
+# Stories handed to the process pool at a time, so a catalog is never fully in memory
+BATCH_SIZE = 512
+
+# Titles are fitted into this box (left, top, right, bottom) between these sizes
+TITLE_BOX = (50, 120, WIDTH - 50, HEIGHT - 120)
+TITLE_MAX_SIZE, TITLE_MIN_SIZE = 40, 20
+
+
+def load_fonts():
+    """Load the large/small fonts used on every placeholder."""
+    return {
+        "large": get_font(80),
+        "small": get_font(30),
+    }
+
+
+def build_background(theme, width, height):
+    """Build the gradient and theme decorations shared by every story of a theme."""
     colors = color_themes[theme]
-    
-    # Create base image with gradient effect
-    img = Image.new('RGB', (width, height), colors['bg'])
+
+    # Gradient effect: each row darkens the base color by up to 30%
+    alpha = np.arange(height) / height
+    rows = np.array(colors['bg'], dtype=np.float64) * (1 - alpha * 0.3)[:, None]
+    pixels = np.broadcast_to(rows.astype(np.uint8)[:, None, :], (height, width, 3))
+    img = Image.fromarray(np.ascontiguousarray(pixels), 'RGB')
     draw = ImageDraw.Draw(img)
-    
-    # Add gradient effect
-    for i in range(height):
-        alpha = i / height
-        color = tuple(int(c * (1 - alpha * 0.3)) for c in colors['bg'])
-        draw.rectangle([(0, i), (width, i+1)], fill=color)
-    
+
     # Add decorative elements based on theme
     if theme == "minecraft":
         # Draw pixelated blocks
@@ -129,62 +155,258 @@ for story in stories:
                      fill=(0, 0, 0))
         draw.ellipse([(ball_x + 30, ball_y + 30), (ball_x + 50, ball_y + 50)], 
                    fill=(255, 255, 255), outline=(0, 0, 0), width=2)
-    
-    # Add story number in corner
-    try:
-        font_large = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 80)
-        font_medium = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 40)
-        font_small = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 30)
-    except:
-        font_large = ImageFont.load_default()
-        font_medium = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-    
+
+    return img
+
+
+# Backgrounds keyed by (theme, width, height), built once per process
+_background_cache = {}
+
+
+def get_background(theme, width, height):
+    """Return a private copy of the cached background for a theme."""
+    key = (theme, width, height)
+    with span("background", theme=theme, cached=key in _background_cache):
+        if key not in _background_cache:
+            _background_cache[key] = build_background(theme, width, height)
+        return _background_cache[key].copy()
+
+
+def render_story(story, fonts):
+    """Draw the themed placeholder for a single story and return the image."""
+    width, height = WIDTH, HEIGHT
+    theme = get_theme(story['id'])
+    colors = color_themes[theme]
+    font_large = fonts['large']
+    font_small = fonts['small']
+
+    # Start from a copy of the cached theme background
+    img = get_background(theme, width, height)
+    draw = ImageDraw.Draw(img)
+
     # Draw story number
     draw.text((30, 30), f"#{story['id']}", fill=colors['text'], font=font_large, 
               stroke_width=3, stroke_fill=(0, 0, 0))
     
-    # Draw title (word wrap if needed)
+    # Draw title, wrapped and shrunk as needed to fit between the number and label
     title = story['title']
-    words = title.split()
-    lines = []
-    current_line = []
-    
-    for word in words:
-        current_line.append(word)
-        test_line = ' '.join(current_line)
-        bbox = draw.textbbox((0, 0), test_line, font=font_medium)
-        if bbox[2] > width - 100:
-            current_line.pop()
-            lines.append(' '.join(current_line))
-            current_line = [word]
-    lines.append(' '.join(current_line))
-    
-    # Draw title lines
-    y_offset = height // 2 - (len(lines) * 50) // 2
-    for line in lines:
-        bbox = draw.textbbox((0, 0), line, font=font_medium)
-        text_width = bbox[2] - bbox[0]
-        x = (width - text_width) // 2
-        draw.text((x, y_offset), line, fill=colors['text'], font=font_medium,
-                 stroke_width=2, stroke_fill=(0, 0, 0))
-        y_offset += 50
-    
-    # Add theme label
-    theme_label = theme.upper().replace("_", " ")
-    bbox = draw.textbbox((0, 0), theme_label, font=font_small)
-    text_width = bbox[2] - bbox[0]
-    draw.text(((width - text_width) // 2, height - 80), theme_label, 
-              fill=colors['text'], font=font_small,
-              stroke_width=2, stroke_fill=(0, 0, 0))
-    
-    # Save image
-    img.save(filename, 'JPEG', quality=95)
-    print(f"Created {filename}")
-
-print("\nAll placeholder images created!")
-print("These themed placeholders will work until you can generate proper AI images.")
-print("\nTo generate actual images:")
-print("1. Use the prompts in story_image_prompts.json")
-print("2. Use DALL-E 3, Midjourney, or Stable Diffusion")
-print("3. Save with the same filenames to replace these placeholders")
\ No newline at end of file
+    with span("text_measure", words=len(title.split())):
+        layout = fit_text(title, TITLE_BOX, TITLE_MAX_SIZE, TITLE_MIN_SIZE)
+
+    with span("draw_text"):
+        draw_layout(draw, layout, fill=colors['text'], stroke_width=2, stroke_fill=(0, 0, 0))
+
+        # Add theme label
+        theme_label = theme.upper().replace("_", " ")
+        text_width = metrics_for(font_small).width(theme_label)
+        draw.text(((width - text_width) // 2, height - 80), theme_label, 
+                  fill=colors['text'], font=font_small,
+                  stroke_width=2, stroke_fill=(0, 0, 0))
+
+    return img
+
+
+def story_inputs(story):
+    """Everything that affects a story's placeholder, for the build manifest."""
+    theme = get_theme(story['id'])
+    return {
+        "id": story['id'],
+        "title": story['title'],
+        "theme": theme,
+        "colors": color_themes[theme],
+        "size": [WIDTH, HEIGHT],
+        "font": font_id(),
+        "encode": JPEG_PARAMS,
+        "renderer": RENDERER_VERSION,
+    }
+
+
+def create_placeholder(story, output_dir, fonts):
+    """Render one story and write it to disk. Returns (output path, write status)."""
+    filename = os.path.join(output_dir, story['filename'])
+    img = render_story(story, fonts)
+    return filename, save_image(img, filename, 'JPEG', **JPEG_PARAMS)
+
+
+# Per-process fonts for pool workers, loaded once by _init_worker
+_worker_fonts = None
+
+
+def _init_worker(trace_config):
+    global _worker_fonts
+    tracing.configure(*trace_config)
+    _worker_fonts = load_fonts()
+
+
+def _create_in_worker(story, output_dir):
+    # Workers write the finished file themselves so only the path, status and
+    # any trace events cross the process boundary, never the image
+    filename, status = create_placeholder(story, output_dir, _worker_fonts)
+    return filename, status, tracing.drain()
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def custom_covers(scenes_path=SCENES_PATH):
+    """Filenames drawn by scene_renderer.py, which placeholders must not overwrite."""
+    if not os.path.exists(scenes_path):
+        return set()
+    return {scene['filename'] for scene in load_scenes(scenes_path)}
+
+
+def create_all(stories, output_dir, workers=1, manifest=None, dry_run=False, force=False,
+               sharded=False, exclude=()):
+    """Render every out-of-date story, serially or spread across a process pool.
+
+    stories may be any iterable (e.g. a catalog stream); it is consumed lazily
+    and only BATCH_SIZE stories are held at a time. Filenames in exclude are
+    left alone, as is any existing image the manifest has no record of (real
+    artwork, or a file from before the manifest) unless force is set, and any
+    story whose image exists under another extension.
+    """
+    counts = {"unchanged": 0, "kept": 0, "artwork": 0}
+
+    def pending():
+        for story in stories:
+            if story['filename'] in exclude:
+                continue
+            filename = image_path(output_dir, story['filename'], sharded)
+
+            # Artwork saved under another extension (009.png for 009.jpg) is
+            # still this story's image; a placeholder beside it would shadow it
+            if _artwork_beside(filename):
+                counts["artwork"] += 1
+                continue
+
+            if (os.path.exists(filename) and not force
+                    and (manifest is None or not manifest.has_entry(filename))):
+                counts["kept"] += 1
+                continue
+
+            inputs = story_inputs(story)
+            if manifest is not None and not force and manifest.is_current(filename, inputs):
+                counts["unchanged"] += 1
+                continue
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            yield story, os.path.dirname(filename), inputs
+
+    if dry_run:
+        for story, story_dir, _ in pending():
+            print(f"Would create {os.path.join(story_dir, story['filename'])}")
+        _report_skipped(counts)
+        return
+
+    stats = WriteStats()
+    if workers <= 1:
+        fonts = load_fonts()
+        # Encode and write in the background while the next placeholder renders
+        with ImageWriter(stats=stats) as writer:
+            for story, story_dir, inputs in pending():
+                filename = os.path.join(story_dir, story['filename'])
+                writer.submit(render_story(story, fonts), filename, 'JPEG', **JPEG_PARAMS,
+                              on_done=lambda path, status, inputs=inputs:
+                                  _record(path, status, inputs, manifest))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tracing.worker_config(),)) as pool:
+            for batch in _batches(pending(), BATCH_SIZE):
+                chunksize = max(1, len(batch) // (workers * 4))
+                results = pool.map(_create_in_worker, [story for story, _, _ in batch],
+                                   [story_dir for _, story_dir, _ in batch],
+                                   chunksize=chunksize)
+                _record_results(results, batch, manifest, stats)
+
+    _report_skipped(counts)
+    if manifest is not None:
+        manifest.save()
+    if sum(stats.counts.values()):
+        print(f"Placeholders: {stats.summary()}")
+
+
+# Extensions artwork for a story may be saved with, in place of its filename's
+ARTWORK_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def _artwork_beside(filename):
+    """True if another image with filename's stem but a different extension exists."""
+    stem, ext = os.path.splitext(filename)
+    return any(os.path.exists(stem + other) for other in ARTWORK_EXTENSIONS
+               if other != ext.lower())
+
+
+def _report_skipped(counts):
+    if counts["unchanged"]:
+        print(f"{counts['unchanged']} placeholders unchanged")
+    if counts["kept"]:
+        print(f"{counts['kept']} existing images not built here were kept "
+              "(use --force to replace them)")
+    if counts["artwork"]:
+        print(f"{counts['artwork']} stories have artwork under another extension; "
+              "no placeholders written for them")
+
+
+def _record(filename, status, inputs, manifest):
+    print(f"{status.capitalize()} {filename}")
+    if manifest is not None:
+        manifest.record(filename, inputs)
+
+
+def _record_results(results, pending, manifest, stats):
+    for (filename, status, events), (_, _, inputs) in zip(results, pending):
+        tracing.extend(events)
+        _record(filename, stats.add(status), inputs, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create themed placeholder images for stories.")
+    parser.add_argument("--catalog", default=CATALOG_DIR,
+                        help="prompt catalog to read titles and filenames from "
+                             "(see prompt_catalog.py)")
+    parser.add_argument("--output-dir", default=output_dir)
+    parser.add_argument("--sharded", action="store_true",
+                        help="write images into id-prefix subdirectories of the output dir")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="number of render processes (0 = one per CPU core)")
+    parser.add_argument("--manifest", default=None,
+                        help="build manifest path (default: alongside the output directory)")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every placeholder even if its inputs are unchanged, "
+                             "and replace existing images the manifest has no record of")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the placeholders that would be rebuilt and exit")
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    tracing.start(args)
+
+    if not os.path.isdir(args.catalog):
+        parser.error(f"no prompt catalog at {args.catalog}; run `python prompt_catalog.py build`")
+    # Stories are streamed from the catalog, one shard at a time
+    stories = iter_images(args.catalog)
+
+    manifest = BuildManifest(args.manifest or manifest_path_for(args.output_dir))
+    workers = args.workers or os.cpu_count() or 1
+    create_all(stories, args.output_dir, workers, manifest, args.dry_run, args.force,
+               args.sharded, custom_covers())
+    tracing.finish(args)
+    if args.dry_run:
+        return
+
+    print("\nAll placeholder images created!")
+    print("These themed placeholders will work until you can generate proper AI images.")
+    print("\nTo generate actual images:")
+    print(f"1. Use the prompts in {args.catalog}/ (python prompt_catalog.py list)")
+    print("2. Use DALL-E 3, Midjourney, or Stable Diffusion")
+    print("3. Save with the same filenames to replace these placeholders")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Shared font lookup for the image generators.
+
+Fonts are resolved once per process and FreeTypeFont objects are memoised by
+(path, size), so the generators can ask for a font inside their per-image
+loops without reloading it from disk.
+
+Lookup order for a font name:
+1. A matching file in $STORYBOOK_FONT_DIR (e.g. Helvetica.ttc, helvetica.ttf)
+2. The macOS system font location
+3. fontconfig (`fc-match`), when installed
+4. Metric-compatible substitutes in the usual Linux font directories
+"""
+
+import functools
+import hashlib
+import os
+import shutil
+import subprocess  # nosec B404
+import sys
+
+from PIL import ImageFont
+
+from tracing import span
+
+DEFAULT_FONT = "Helvetica"
+
+FONT_DIR_ENV = "STORYBOOK_FONT_DIR"
+
+FONT_EXTENSIONS = (".ttc", ".ttf", ".otf")
+
+# Where the font lives on macOS, which is what the artwork was designed with
+SYSTEM_FONTS = {
+    "Helvetica": "/System/Library/Fonts/Helvetica.ttc",
+}
+
+# Substitutes to look for when neither the font dir nor fontconfig finds one
+SUBSTITUTES = {
+    "Helvetica": ["LiberationSans-Regular.ttf", "NimbusSans-Regular.otf",
+                  "Arial.ttf", "DejaVuSans.ttf"],
+}
+
+FONT_SEARCH_DIRS = ["/usr/share/fonts", "/usr/local/share/fonts",
+                    os.path.expanduser("~/.fonts"),
+                    os.path.expanduser("~/.local/share/fonts")]
+
+# Number of (path, size) FreeTypeFont objects kept alive per process
+FONT_CACHE_SIZE = 64
+
+
+def _find_in_dir(directory, name):
+    wanted = {f"{name}{ext}".lower() for ext in FONT_EXTENSIONS}
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.lower() in wanted:
+            return os.path.join(directory, entry)
+    return None
+
+
+def _fc_match(name):
+    if shutil.which("fc-match") is None:
+        return None
+    try:
+        result = subprocess.run(["fc-match", "-f", "%{file}", name],  # nosec B603 B607
+                                capture_output=True, text=True, timeout=10, check=False)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    path = result.stdout.strip()
+    return path if path and os.path.exists(path) else None
+
+
+def _find_substitute(name):
+    wanted = SUBSTITUTES.get(name, [])
+    for directory in FONT_SEARCH_DIRS:
+        for root, _, files in os.walk(directory):
+            for candidate in wanted:
+                if candidate in files:
+                    return os.path.join(root, candidate)
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_font(name=DEFAULT_FONT):
+    """Return the path of the font file used for name, or None if none was found."""
+    with span("font_resolve", name=name):
+        return _resolve_font(name)
+
+
+def _resolve_font(name):
+    font_dir = os.environ.get(FONT_DIR_ENV)
+    if font_dir:
+        path = _find_in_dir(font_dir, name)
+        if path:
+            return path
+
+    path = SYSTEM_FONTS.get(name)
+    if path and os.path.exists(path):
+        return path
+
+    path = _fc_match(name) or _find_substitute(name)
+    if path is None:
+        print(f"Warning: no font file found for {name}; using Pillow's default font. "
+              f"Set {FONT_DIR_ENV} to a directory containing it.", file=sys.stderr)
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def _default_font():
+    # One shared object, so caches keyed on the font (text_layout.metrics_for) hit
+    return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(path, size):
+    with span("font_load", path=path, size=size):
+        return ImageFont.truetype(path, size)
+
+
+def get_font(size, name=DEFAULT_FONT):
+    """Return a cached FreeTypeFont for name at size, or Pillow's default font."""
+    path = resolve_font(name)
+    if path is None:
+        return _default_font()
+    return _load_font(path, size)
+
+
+@functools.lru_cache(maxsize=None)
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def font_id(name=DEFAULT_FONT):
+    """Identifies the resolved font in build manifests by file name and content,
+    not path, so the same font in another checkout or font directory matches."""
+    path = resolve_font(name)
+    if path is None:
+        return "default"
+    return f"{os.path.basename(path)}:{_file_digest(path)[:16]}"
@@ -0,0 +1,57 @@
+"""
+Minimal front-matter reader for the story and blend MDX files.
+
+The content only uses flat `key: value` pairs with quoted or bare strings
+and inline lists (`sightWords: []`), so this avoids a YAML dependency and
+lets callers read just the header block without loading the story body.
+"""
+
+
+def parse_value(raw):
+    """Parse a scalar or inline list value from a front-matter line."""
+    raw = raw.strip()
+    if raw.startswith('[') and raw.endswith(']'):
+        inner = raw[1:-1].strip()
+        if not inner:
+            return []
+        return [parse_value(item) for item in inner.split(',')]
+    if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in '"\'':
+        return raw[1:-1]
+    return raw
+
+
+def parse_lines(lines):
+    """Parse front-matter lines (without the --- fences) into a dict."""
+    data = {}
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith('#') or ':' not in line:
+            continue
+        key, _, value = line.partition(':')
+        data[key.strip()] = parse_value(value)
+    return data
+
+
+def read_front_matter(path):
+    """Read only the front-matter block of an MDX file; the body is never loaded."""
+    lines = []
+    with open(path, 'r', encoding='utf-8') as f:
+        if f.readline().strip() != '---':
+            return {}
+        for line in f:
+            if line.strip() == '---':
+                return parse_lines(lines)
+            lines.append(line)
+    # Unterminated block: treat as no front-matter, like gray-matter does
+    return {}
+
+
+def split_front_matter(text):
+    """Split full MDX text into (front-matter dict, body)."""
+    if not text.startswith('---'):
+        return {}, text
+    lines = text.split('\n')
+    for i in range(1, len(lines)):
+        if lines[i].strip() == '---':
+            body = '\n'.join(lines[i + 1:])
+            return parse_lines(lines[1:i]), body
+    return {}, text
@@ -1,59 +1,86 @@
-from PIL import Image, ImageDraw, ImageFont
-import os
+"""
+Generate the custom cover for a single story.
 
-def generate_custom_image(story_id, title, output_path):
+The drawing lives in scene_renderer.py: a story's cover is its scene spec
+from story_scenes.json, or for any other story the night scene of story 007
+with that story's id and title (and so its own, reproducible, starfield).
+Use `python scene_renderer.py` to render every scene in one run.
+"""
+
+import argparse
+
+from build_manifest import BuildManifest, manifest_path_for
+from content_writer import UNCHANGED, save_image
+from scene_renderer import load_scenes, render_scene, scene_inputs
+import tracing
+
+# Scene used for stories without a spec of their own ("Bad Mobs at Night")
+TEMPLATE_ID = "007"
+
+
+def scene_for(story_id, title):
+    """The scene spec for a story: its own, or the template with its id and title."""
+    scenes = {scene["id"]: scene for scene in load_scenes()}
+    scene = dict(scenes.get(story_id) or scenes[TEMPLATE_ID])
+    if scene["id"] != story_id:
+        # Drop the template's explicit seed (if any) so each story gets its own sky
+        scene.pop("seed", None)
+    return dict(scene, id=story_id, title=title, filename=f"{story_id}.jpg")
+
+
+def image_inputs(story_id, title):
+    """Everything that affects the custom image, for the build manifest."""
+    return scene_inputs(scene_for(story_id, title))
+
+
+def render_custom_image(story_id, title):
     """
-    Generates a custom placeholder image for a single story.
+    Draws the custom placeholder image for a single story.
     """
-    width, height = 800, 600
-    
-    # Theme for "Bad Mobs at Night" (Minecraft)
-    colors = {
-        "bg": (50, 50, 50),  # Dark gray for night
-        "accent": (255, 80, 80),  # Red for "bad"
-        "text": (255, 255, 255)
-    }
-    
-    img = Image.new('RGB', (width, height), color=colors['bg'])
-    draw = ImageDraw.Draw(img)
-
-    # Add some night-time elements (stars)
-    for _ in range(100):
-        x, y = os.urandom(2)
-        x = (x / 255) * width
-        y = (y / 255) * height / 2 # Only in the top half
-        draw.point((x,y), fill=(200, 200, 200))
-
-    # Add a moon
-    draw.ellipse((width - 150, 50, width - 50, 150), fill=(240, 240, 210), outline=(0,0,0))
-    
-    # Get fonts
-    try:
-        font_large = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 70)
-        font_small = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 30)
-    except IOError:
-        font_large = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-
-    # Draw title
-    title_bbox = draw.textbbox((0, 0), title, font=font_large)
-    title_width = title_bbox[2] - title_bbox[0]
-    title_height = title_bbox[3] - title_bbox[1]
-    title_pos = ((width - title_width) / 2, (height - title_height) / 2)
-    draw.text(title_pos, title, fill=colors['text'], font=font_large, stroke_width=2, stroke_fill=(0,0,0))
-    
-    # Draw story ID
-    id_text = f"#{story_id}"
-    id_bbox = draw.textbbox((0,0), id_text, font=font_small)
-    id_pos = (width - id_bbox[2] - 30, height - id_bbox[3] - 30)
-    draw.text(id_pos, id_text, fill=colors['text'], font=font_small)
-
-    img.save(output_path, 'JPEG')
-    print(f"Created custom image: {output_path}")
+    return render_scene(scene_for(story_id, title))
+
+
+def _report(output_path, status):
+    if status == UNCHANGED:
+        print(f"Custom image unchanged: {output_path}")
+    else:
+        print(f"Created custom image: {output_path}")
+
+
+def generate_custom_image(story_id, title, output_path, writer=None):
+    """
+    Generates a custom placeholder image for a single story. With an
+    ImageWriter the image is encoded and written in the background.
+    """
+    img = render_custom_image(story_id, title)
+    if writer is not None:
+        writer.submit(img, output_path, 'JPEG', on_done=_report)
+    else:
+        _report(output_path, save_image(img, output_path, 'JPEG'))
 
 if __name__ == '__main__':
     STORY_ID = "007"
     STORY_TITLE = "Bad Mobs at Night"
-    OUTPUT_FILE = f"app/public/story-images/{STORY_ID}.jpg"
-    
-    generate_custom_image(STORY_ID, STORY_TITLE, OUTPUT_FILE) 
\ No newline at end of file
+    OUTPUT_DIR = "app/public/story-images"
+    OUTPUT_FILE = f"{OUTPUT_DIR}/{STORY_ID}.jpg"
+
+    parser = argparse.ArgumentParser(description="Generate the custom image for one story.")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild even if the inputs are unchanged")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report whether the image would be rebuilt and exit")
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    tracing.start(args)
+
+    manifest = BuildManifest(manifest_path_for(OUTPUT_DIR))
+    inputs = image_inputs(STORY_ID, STORY_TITLE)
+    if not args.force and manifest.is_current(OUTPUT_FILE, inputs):
+        print(f"{OUTPUT_FILE} is unchanged")
+    elif args.dry_run:
+        print(f"Would create custom image: {OUTPUT_FILE}")
+    else:
+        generate_custom_image(STORY_ID, STORY_TITLE, OUTPUT_FILE)
+        manifest.record(OUTPUT_FILE, inputs)
+        manifest.save()
+    tracing.finish(args)
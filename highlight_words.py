@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Pre-compute word highlights for every story at build time.
+
+All highlight words (small, big and sight words) are loaded into one
+Aho-Corasick automaton, and each story body is scanned once, in time linear in
+the story length however many words the lists hold. Matches are kept only on
+whole-word boundaries and only for the lists that apply to the story's
+wordType. The hand-inserted <u> tags are ignored when scanning, so the output
+always reflects the current word lists.
+
+Outputs, per story:
+- a sidecar JSON (default) with [start, end, list] offsets into the story
+  body with its <u> tags removed, under app/public/content/highlights/
+- or, with --mdx-dir, the story MDX with <u> tags regenerated from the lists
+  (pass the stories dir itself to rewrite the stories in place)
+
+It also reports the story words that no word list covers.
+"""
+
+import argparse
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+from content_writer import WriteStats
+from list_stories import STORIES_DIR
+from word_lists import load_word_lists
+
+SIDECAR_DIR = "app/public/content/highlights"
+
+# Lists highlighted for each story wordType; other types use every list
+HIGHLIGHT_LISTS = {
+    "small": ("small", "sight"),
+    "big": ("big", "sight"),
+}
+
+TAG_RE = re.compile(r'</?u>')
+TOKEN_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)*")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every occurrence of every pattern in one pass."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+    def add(self, pattern, payload):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append((len(pattern), payload))
+
+    def build(self):
+        """Compute failure links breadth-first; call once after adding patterns."""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        return self
+
+    def search(self, text):
+        """Yield (start, end, payload) for every pattern occurrence in text."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                yield i - length + 1, i + 1, payload
+
+
+def build_automaton(word_lists):
+    """One automaton over every list; each word's payload is the lists containing it."""
+    lists_for = {}
+    for name, words in word_lists.items():
+        for word in words:
+            lists_for.setdefault(word.lower(), set()).add(name)
+    automaton = AhoCorasick()
+    for word, names in lists_for.items():
+        automaton.add(word, frozenset(names))
+    return automaton.build(), set(lists_for)
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+
+def find_highlights(text, automaton, allowed):
+    """Whole-word matches from the allowed lists, leftmost-longest and non-overlapping.
+
+    Returns [(start, end, list name)].
+    """
+    lowered = text.lower()
+    candidates = []
+    for start, end, names in automaton.search(lowered):
+        if start > 0 and _is_word_char(lowered[start - 1]):
+            continue
+        if end < len(lowered) and _is_word_char(lowered[end]):
+            continue
+        matching = sorted(names & allowed)
+        if matching:
+            candidates.append((start, end, matching[0]))
+
+    candidates.sort(key=lambda m: (m[0], m[0] - m[1]))
+    spans = []
+    last_end = 0
+    for start, end, name in candidates:
+        if start >= last_end:
+            spans.append((start, end, name))
+            last_end = end
+    return spans
+
+
+def split_story(text):
+    """Split raw MDX into (front-matter block including fences, body)."""
+    lines = text.split('\n')
+    if lines and lines[0].strip() == '---':
+        for i in range(1, len(lines)):
+            if lines[i].strip() == '---':
+                return '\n'.join(lines[:i + 1]) + '\n', '\n'.join(lines[i + 1:])
+    return '', text
+
+
+def word_type_of(header, rel):
+    match = re.search(r'^(?:wordType|workType):\s*["\']?([^"\'\n]+)', header, re.M)
+    if match:
+        return match.group(1).strip()
+    return rel.parts[0] if len(rel.parts) > 1 else None
+
+
+def highlight_story(path, stories_dir, automaton, word_lists):
+    """Scan one story. Returns (slug, header, plain body, spans, lists used)."""
+    text = path.read_text(encoding='utf-8')
+    header, body = split_story(text)
+    plain = TAG_RE.sub('', body)
+    rel = path.relative_to(stories_dir)
+    allowed = set(HIGHLIGHT_LISTS.get(word_type_of(header, rel), word_lists))
+    spans = find_highlights(plain, automaton, allowed)
+    return rel.with_suffix('').as_posix(), header, plain, spans, sorted(allowed)
+
+
+def render_highlighted(plain, spans):
+    """Body text with each span wrapped in <u> tags."""
+    parts = []
+    last = 0
+    for start, end, _ in spans:
+        parts.append(plain[last:start])
+        parts.append(f"<u>{plain[start:end]}</u>")
+        last = end
+    parts.append(plain[last:])
+    return ''.join(parts)
+
+
+def write_sidecar(sidecar_dir, slug, spans, lists, stats):
+    """Write one story's highlight offsets. Returns the write status."""
+    out_path = os.path.join(sidecar_dir, f"{slug}.json")
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    sidecar = {
+        "slug": slug,
+        "lists": lists,
+        "highlights": [[start, end, name] for start, end, name in spans],
+    }
+    return stats.write(out_path, json.dumps(sidecar, separators=(',', ':')) + '\n')
+
+
+def uncovered_words(plain, covered):
+    return Counter(token for token in (t.lower() for t in TOKEN_RE.findall(plain))
+                   if token not in covered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-compute story word highlights.")
+    parser.add_argument("--stories-dir", default=STORIES_DIR)
+    parser.add_argument("--sidecar-dir", default=SIDECAR_DIR,
+                        help="where to write per-story highlight offsets")
+    parser.add_argument("--mdx-dir", default=None,
+                        help="write pre-highlighted MDX here instead of sidecars "
+                             "(use the stories dir to rewrite stories in place)")
+    parser.add_argument("--report", default=None,
+                        help="write uncovered-word counts to this JSON file")
+    parser.add_argument("--top", type=int, default=20,
+                        help="how many uncovered words to print")
+    args = parser.parse_args()
+
+    word_lists = load_word_lists()
+    automaton, covered = build_automaton(word_lists)
+    stories_dir = Path(args.stories_dir)
+    stats = WriteStats()
+    uncovered = Counter()
+    total_spans = 0
+
+    for path in sorted(stories_dir.rglob('*.mdx')):
+        slug, header, plain, spans, lists = highlight_story(path, stories_dir, automaton,
+                                                            word_lists)
+        total_spans += len(spans)
+        uncovered.update(uncovered_words(plain, covered))
+
+        if args.mdx_dir:
+            out_path = os.path.join(args.mdx_dir, f"{slug}.mdx")
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            stats.write(out_path, header + render_highlighted(plain, spans))
+        else:
+            write_sidecar(args.sidecar_dir, slug, spans, lists, stats)
+
+    print(f"Highlighted {total_spans} words ({stats.summary()})")
+    print(f"\n{len(uncovered)} distinct story words are not in any word list")
+    for word, count in uncovered.most_common(args.top):
+        print(f"  {word}: {count}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(dict(uncovered.most_common()), f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
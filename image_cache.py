@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of generated images.
+
+Entries are keyed by a hash of the normalized prompt (Unicode NFC, case-folded,
+whitespace collapsed) plus the generation parameters (model, size, output
+format), so a prompt that is reused, reformatted or rolled back to an earlier
+wording is served from disk instead of the image backend.
+
+Layout, under .image-cache/ (or $STORYBOOK_IMAGE_CACHE):
+    objects/ab/abcdef....jpg   image bytes
+    index.json                 key -> size, last use and metadata
+
+The cache is capped at max_bytes; the least recently used entries are evicted
+first. Cached images are hard-linked into place when the cache and the output
+are on the same filesystem, and copied otherwise.
+
+    python image_cache.py            # show entry count and size
+    python image_cache.py --prune    # evict down to --max-mb
+    python image_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import unicodedata
+
+from content_writer import CREATED, UNCHANGED, UPDATED, write_if_changed
+
+CACHE_DIR = ".image-cache"
+CACHE_DIR_ENV = "STORYBOOK_IMAGE_CACHE"
+
+# Default cap on the bytes of cached images
+MAX_BYTES = 2 * 1024 ** 3
+
+
+def normalize_prompt(prompt):
+    return " ".join(unicodedata.normalize("NFC", prompt).casefold().split())
+
+
+def cache_key(prompt, params):
+    data = json.dumps({"prompt": normalize_prompt(prompt), "params": params}, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _same_bytes(path_a, path_b):
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, 'rb') as a, open(path_b, 'rb') as b:
+        return a.read() == b.read()
+
+
+class ImageCache:
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        self.directory = directory or os.environ.get(CACHE_DIR_ENV) or CACHE_DIR
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.index_path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _object_path(self, key, ext):
+        return os.path.join(self.directory, "objects", key[:2], key + ext)
+
+    def path_for(self, key):
+        """Path of the cached image for key, or None. Counts as a use for LRU."""
+        with self.lock:
+            entry = self.entries.get(key)
+            path = entry and self._object_path(key, entry["ext"])
+            if path is None or not os.path.exists(path):
+                if entry:
+                    del self.entries[key]
+                    self.dirty = True
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self.dirty = True
+            self.hits += 1
+            return path
+
+    def put(self, key, data, ext, metadata=None):
+        path = self._object_path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_if_changed(path, data)
+        with self.lock:
+            self.entries[key] = {"ext": ext, "size": len(data), "last_used": time.time(),
+                                 "created": time.time(), "meta": metadata or {}}
+            self.dirty = True
+            self._evict()
+
+    def materialize(self, key, output_path):
+        """Place the cached image for key at output_path. Returns a write status or None."""
+        path = self.path_for(key)
+        if path is None:
+            return None
+        existed = os.path.exists(output_path)
+        if existed and _same_bytes(path, output_path):
+            return UNCHANGED
+        tmp_path = os.path.join(os.path.dirname(output_path) or '.',
+                                f".{os.path.basename(output_path)}.{key[:12]}.tmp")
+        try:
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return UPDATED if existed else CREATED
+
+    def total_bytes(self):
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def _evict(self):
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self.entries.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(self._object_path(key, entry["ext"]))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            del self.entries[key]
+        self.dirty = True
+
+    def prune(self):
+        with self.lock:
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            shutil.rmtree(os.path.join(self.directory, "objects"), ignore_errors=True)
+            self.entries = {}
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+                f.write('\n')
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the generated-image cache.")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--max-mb", type=float, default=MAX_BYTES / 1024 ** 2)
+    parser.add_argument("--prune", action="store_true", help="evict down to --max-mb")
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    args = parser.parse_args()
+
+    cache = ImageCache(args.cache_dir, int(args.max_mb * 1024 ** 2))
+    if args.clear:
+        cache.clear()
+    elif args.prune:
+        cache.prune()
+    cache.save()
+    print(f"{cache.directory}: {len(cache.entries)} images, "
+          f"{cache.total_bytes() / 1024 ** 2:.1f} MB (cap {args.max_mb:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
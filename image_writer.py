@@ -0,0 +1,73 @@
+"""
+Background encode-and-write stage for the image generators.
+
+The render loop hands finished images to an ImageWriter and moves straight on
+to drawing the next one, while a small thread pool JPEG-encodes and writes the
+earlier ones (Pillow releases the GIL while encoding, so the two really do
+overlap). At most max_pending images are queued or in flight; submit() blocks
+once that many are outstanding, which bounds memory on large batches.
+
+Completion callbacks run on the submitting thread, in submission order, so
+callers can update a build manifest or print progress without locking:
+
+    with ImageWriter(stats=stats) as writer:
+        for name in names:
+            img = render(name)
+            writer.submit(img, path, 'JPEG', on_done=lambda path, status: ...)
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from content_writer import WriteStats, save_image
+
+# Encoding is the slow part of a write; a couple of threads keep up with a
+# single render loop without competing with it for every core
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ImageWriter:
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=None, stats=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-writer")
+        self.slots = threading.BoundedSemaphore(max_pending or workers * 2)
+        self.stats = stats if stats is not None else WriteStats()
+        self.pending = deque()
+
+    def submit(self, img, path, format, on_done=None, **params):
+        """Queue img to be encoded and written to path; blocks while the queue is full."""
+        self._complete(block=False)
+        self.slots.acquire()
+        try:
+            future = self.pool.submit(save_image, img, path, format, **params)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.pending.append((future, path, on_done))
+        return future
+
+    def _complete(self, block):
+        """Run callbacks for finished writes at the head of the queue."""
+        while self.pending and (block or self.pending[0][0].done()):
+            future, path, on_done = self.pending.popleft()
+            status = self.stats.add(future.result())
+            if on_done is not None:
+                on_done(path, status)
+
+    def close(self):
+        """Wait for every queued write, re-raising the first error."""
+        try:
+            self._complete(block=True)
+        finally:
+            self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pool.shutdown(wait=True, cancel_futures=True)
@@ -1,30 +1,109 @@
 #!/usr/bin/env python3
-"""List all stories with their titles and image filenames."""
+"""
+Build a compact JSON index of every story under app/public/content/stories.
 
+The stories tree is walked recursively (small/, big/, ...) and only the
+front-matter block of each file is read. Files whose mtime and size match
+the previous index are reused as-is, so a rebuild after editing one story
+reads one file.
+"""
+
+import argparse
+import json
 import os
-import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def extract_story_info():
-    stories_dir = Path("/Users/pmbp/Documents/Code/storybook/app/public/content/stories")
-    stories = []
-    
-    for mdx_file in sorted(stories_dir.glob("*.mdx")):
-        with open(mdx_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract title and img from frontmatter
-        title_match = re.search(r'title:\s*"([^"]+)"', content)
-        img_match = re.search(r'img:\s*"([^"]+)"', content)
-        
-        if title_match and img_match:
-            title = title_match.group(1)
-            img = img_match.group(1)
-            stories.append((title, img))
-    
-    return stories
+from frontmatter import read_front_matter
+
+STORIES_DIR = "app/public/content/stories"
+INDEX_PATH = "app/public/content/stories-index.json"
+
+INDEX_VERSION = 1
+
+
+def index_entry(path, stories_dir, stat):
+    """Build the index record for one story file."""
+    data = read_front_matter(path)
+    rel = path.relative_to(stories_dir)
+    slug = rel.with_suffix('').as_posix()
+    # wordType falls back to the directory the story lives in (small/big)
+    word_type = data.get('wordType') or data.get('workType') or (
+        rel.parts[0] if len(rel.parts) > 1 else None)
+    return {
+        "slug": slug,
+        "id": data.get('id') or path.stem,
+        "title": data.get('title'),
+        "img": data.get('img'),
+        "wordType": word_type,
+        "sightWords": data.get('sightWords') or [],
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def load_index(index_path):
+    """Return the previous index keyed by slug, or {} if there is none."""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get('version') != INDEX_VERSION:
+        return {}
+    return {entry['slug']: entry for entry in index.get('stories', [])}
+
+
+def build_index(stories_dir=STORIES_DIR, index_path=INDEX_PATH, workers=8):
+    """Rebuild the index incrementally. Returns (entries, number of files re-read)."""
+    stories_dir = Path(stories_dir)
+    previous = load_index(index_path)
+
+    entries = []
+    stale = []
+    for path in sorted(stories_dir.rglob('*.mdx')):
+        stat = path.stat()
+        slug = path.relative_to(stories_dir).with_suffix('').as_posix()
+        entry = previous.get(slug)
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            entries.append(entry)
+        else:
+            stale.append((path, stat))
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            entries.extend(pool.map(lambda item: index_entry(item[0], stories_dir, item[1]),
+                                    stale))
+    entries.sort(key=lambda entry: entry['slug'])
+
+    # Only rewrite the index when something actually changed
+    if stale or len(entries) != len(previous):
+        index = {"version": INDEX_VERSION, "stories": entries}
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(tmp_path, index_path)
+    return entries, len(stale)
+
+
+def extract_story_info(stories_dir=STORIES_DIR, index_path=INDEX_PATH):
+    """Return (title, img) for every story, in slug order."""
+    entries, _ = build_index(stories_dir, index_path)
+    return [(entry['title'], entry['img']) for entry in entries]
+
 
 if __name__ == "__main__":
-    stories = extract_story_info()
-    for title, img in stories:
-        print(f"{title}: {img}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the story index.")
+    parser.add_argument("--stories-dir", default=STORIES_DIR)
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("-j", "--workers", type=int, default=8,
+                        help="number of threads reading front-matter")
+    parser.add_argument("--list", action="store_true",
+                        help="also print every story's title and image")
+    args = parser.parse_args()
+
+    entries, reread = build_index(args.stories_dir, args.index, args.workers)
+    if args.list:
+        for entry in entries:
+            print(f"{entry['title']}: {entry['img']}")
+    print(f"Indexed {len(entries)} stories ({reread} re-read) into {args.index}")
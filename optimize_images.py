@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Shrink the images in app/public/story-images without visible change.
+
+Every image is re-encoded a few ways suited to its content, and the smallest
+candidate replaces the file only if it is smaller than what is there now:
+
+- PNG: RGBA with a fully opaque alpha channel drops to RGB, images with at
+  most 256 colours become exact palette PNGs, and EXIF/XMP metadata is
+  dropped (the ICC profile is kept). All candidates are pixel-identical.
+- JPEG: lossless re-packing with `jpegtran -optimize -progressive`, when
+  jpegtran is installed. Without it JPEGs are left alone by default.
+
+With --convert, files may also change format (and extension), and the `img:`
+front-matter references under app/public/content are updated to match:
+
+- art with at most 256 colours becomes an exact palette PNG
+- anything else becomes WebP (or a tuned progressive JPEG if smaller)
+
+Nothing is quantized lossily here: flat art that JPEG has smeared into
+thousands of colours cannot be told apart from real artwork reliably, so it
+is treated as photographic. The blend tiles, the flat art this matters for,
+are written as palette PNGs by create_blend_images.py itself.
+
+Images produced by the generators (the blend tiles, and anything else in
+the build manifest) are never converted, because the generator would just
+recreate them under the old name; they are still optimised in place.
+
+    python optimize_images.py --dry-run
+    python optimize_images.py -j 0
+    python optimize_images.py --convert
+"""
+
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import io
+import os
+import re
+import shutil
+import subprocess  # nosec B404
+
+import numpy as np
+
+from blend_trie import TILE_EXT, all_pages, page_name
+from build_manifest import BuildManifest, manifest_path_for
+from content_writer import encode_image, write_if_changed
+
+source_dir = "app/public/story-images"
+content_dir = "app/public/content"
+
+EXTENSIONS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+
+PHOTO_WEBP = {"quality": 85, "method": 6}
+PHOTO_JPEG = {"quality": 85, "optimize": True, "progressive": True}
+
+
+def _png(img, **params):
+    params.setdefault("optimize", True)
+    return encode_image(img, "PNG", **params)
+
+
+def _jpegtran(path):
+    """Losslessly re-pack a JPEG with jpegtran, or None if it is not installed."""
+    if shutil.which("jpegtran") is None:
+        return None
+    result = subprocess.run(["jpegtran", "-copy", "none", "-optimize", "-progressive", path],  # nosec B603 B607
+                            capture_output=True, check=False)
+    return result.stdout if result.returncode == 0 and result.stdout else None
+
+
+def _opaque(img):
+    """True if every pixel is fully opaque: no alpha channel, no palette or
+    colour-key transparency, or an alpha channel that is 255 throughout."""
+    if img.mode not in ("RGBA", "LA", "PA") and "transparency" not in img.info:
+        return True
+    return img.convert("RGBA").getchannel("A").getextrema() == (255, 255)
+
+
+def lossless_candidates(path, img):
+    """Same-format, pixel-identical encodings of the image at path."""
+    candidates = []
+    if img.format == "PNG":
+        params = {}
+        if "icc_profile" in img.info:
+            params["icc_profile"] = img.info["icc_profile"]
+        work = img
+        if img.mode == "RGBA" and _opaque(img):
+            work = img.convert("RGB")
+        candidates.append(_png(work, **params))
+        if work.mode in ("RGB", "RGBA", "L") and work.getcolors(256) is not None:
+            candidates.append(_png(work.quantize(256, method=Image.Quantize.FASTOCTREE
+                                                 if work.mode == "RGBA"
+                                                 else Image.Quantize.MEDIANCUT), **params))
+            # quantize() may merge colours; keep the palette only if it is exact
+            if candidates[-1] and not _same_pixels(work, candidates[-1]):
+                candidates.pop()
+    elif img.format == "JPEG":
+        data = _jpegtran(path)
+        if data:
+            candidates.append(data)
+    return [(os.path.splitext(path)[1], data) for data in candidates]
+
+
+def _same_pixels(img, data):
+    with Image.open(io.BytesIO(data)) as other:
+        return np.array_equal(np.asarray(img.convert("RGBA")), np.asarray(other.convert("RGBA")))
+
+
+def convert_candidates(img):
+    """Encodings in the format that best suits the content, possibly a new one."""
+    work = img.convert("RGB") if _opaque(img) else img.convert("RGBA")
+    colors = work.getcolors(256)
+    if colors is not None:
+        method = Image.Quantize.MEDIANCUT if work.mode == "RGB" else Image.Quantize.FASTOCTREE
+        data = _png(work.quantize(len(colors), method=method))
+        # Only an exact palette counts; otherwise fall through to WebP/JPEG
+        if _same_pixels(work, data):
+            return [(".png", data)]
+    if not _opaque(img):
+        return [(".webp", encode_image(img, "WEBP", **PHOTO_WEBP))]
+    rgb = img.convert("RGB")
+    return [(".webp", encode_image(rgb, "WEBP", **PHOTO_WEBP)),
+            (".jpg", encode_image(rgb, "JPEG", **PHOTO_JPEG))]
+
+
+def optimize(path, convert=False, dry_run=False):
+    """Optimise one image. Returns (path, new path, old bytes, new bytes)."""
+    old_size = os.path.getsize(path)
+    with Image.open(path) as img:
+        img.load()
+        candidates = lossless_candidates(path, img)
+        if convert:
+            candidates += convert_candidates(img)
+
+    ext, data = min(candidates, key=lambda c: len(c[1]), default=(None, None))
+    if data is None or len(data) >= old_size:
+        return path, path, old_size, old_size
+
+    new_path = os.path.splitext(path)[0] + ext
+    if new_path != path and os.path.exists(new_path):
+        # Another file already has that name; stay in the original format
+        return path, path, old_size, old_size
+    if not dry_run:
+        write_if_changed(new_path, data)
+        if new_path != path:
+            os.unlink(path)
+    return path, new_path, old_size, len(data)
+
+
+IMG_RE = re.compile(r'^(img:\s*["\']?)([^"\'\n]+)', re.M)
+
+
+def update_references(renames, content_root, dry_run=False):
+    """Point `img:` front-matter at renamed images. Returns the files changed."""
+    changed = []
+    for root, _, files in os.walk(content_root):
+        for name in files:
+            if not name.endswith((".mdx", ".md")):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            updated = IMG_RE.sub(lambda m: m.group(1) + renames.get(m.group(2), m.group(2)), text)
+            if updated != text:
+                changed.append(path)
+                if not dry_run:
+                    write_if_changed(path, updated)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Losslessly shrink the story images.")
+    parser.add_argument("--source-dir", default=source_dir)
+    parser.add_argument("--content-dir", default=content_dir,
+                        help="where to update img: references after --convert")
+    parser.add_argument("--convert", action="store_true",
+                        help="allow changing format (palette PNG / WebP) and file extension")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="number of processes (0 = one per CPU core)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report the savings without changing any file")
+    args = parser.parse_args()
+
+    generated = {os.path.abspath(os.path.join(args.source_dir, f"{page_name(*page)}{TILE_EXT}"))
+                 for page in all_pages()}
+    manifest_path = manifest_path_for(args.source_dir)
+    if os.path.exists(manifest_path):
+        manifest = BuildManifest(manifest_path)
+        base = os.path.dirname(os.path.abspath(manifest_path))
+        generated |= {os.path.normpath(os.path.join(base, key)) for key in manifest.entries}
+
+    paths = sorted(os.path.join(args.source_dir, name) for name in os.listdir(args.source_dir)
+                   if os.path.splitext(name)[1].lower() in EXTENSIONS)
+    convert = [args.convert and os.path.abspath(path) not in generated for path in paths]
+    if args.convert and not all(convert):
+        print(f"Not converting {convert.count(False)} generated images (optimising in place)")
+
+    if shutil.which("jpegtran") is None and not args.convert:
+        print("jpegtran not found; JPEGs are skipped (install libjpeg-turbo-progs to include them)")
+
+    workers = args.workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(optimize, paths, convert, [args.dry_run] * len(paths)))
+
+    total_before = total_after = 0
+    renames = {}
+    for path, new_path, before, after in results:
+        total_before += before
+        total_after += after
+        if after < before:
+            name = os.path.basename(path)
+            new_name = os.path.basename(new_path)
+            arrow = f" -> {new_name}" if new_name != name else ""
+            print(f"{name}{arrow}: {before:,} -> {after:,} bytes "
+                  f"(-{(1 - after / before) * 100:.1f}%)")
+            if new_name != name:
+                renames[name] = new_name
+
+    if renames:
+        changed = update_references(renames, args.content_dir, args.dry_run)
+        verb = "Would update" if args.dry_run else "Updated"
+        print(f"{verb} image references in {len(changed)} content files")
+
+    saved = total_before - total_after
+    verb = "Would save" if args.dry_run else "Saved"
+    print(f"\n{verb} {saved:,} bytes of {total_before:,} "
+          f"({saved / total_before * 100 if total_before else 0:.1f}%) across {len(paths)} images")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Image prompt catalog derived from the stories' front-matter.
+
+Every story with an `img:` gets one catalog entry:
+
+    {"id": "001", "slug": "small/001", "title": "The Pink Pet",
+     "prompt": "...", "filename": "001.jpg"}
+
+The prompt comes from the story's own `prompt:` front-matter field if it has
+one, else from the legacy story_image_prompts.json entry for its image, else
+from PROMPT_TEMPLATE and the title, so every story on disk has a prompt.
+
+The catalog is sharded JSONL under story_prompts/: entries are grouped by
+the prefix of their image id (shard_prefix: 000001-000999 -> "000.jsonl"),
+sorted by id and slug within a shard. Building streams the stories once and
+spools entries per shard, so memory holds one shard at a time; readers stream
+line by line and can open only the shards for the ids they need.
+
+Stories that share an image (small/001 and big/001 both use 001.jpg) get an
+entry each; iter_images() yields one entry per image, the first by slug.
+
+    python prompt_catalog.py build
+    python prompt_catalog.py get 051
+    python prompt_catalog.py list --missing-prompts
+
+Image generators can also write their outputs into the same prefix
+subdirectories (image_path with sharded=True, --sharded on the command line)
+so no directory holds more than 10**SHARD_DIGITS images.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from content_writer import WriteStats
+from frontmatter import read_front_matter
+from list_stories import STORIES_DIR
+
+CATALOG_DIR = "story_prompts"
+LEGACY_PROMPTS = "story_image_prompts.json"
+
+# Image ids are zero-padded to ID_WIDTH and the last SHARD_DIGITS dropped,
+# so each shard (and sharded image directory) holds at most 1,000 ids
+ID_WIDTH = 6
+SHARD_DIGITS = 3
+
+PROMPT_TEMPLATE = ("A bright, friendly children's storybook illustration for the story "
+                   "\"{title}\", colorful cartoon style, simple shapes, no text")
+
+
+def shard_prefix(image_id):
+    return str(image_id).zfill(ID_WIDTH)[:-SHARD_DIGITS]
+
+
+def image_path(output_dir, filename, sharded=False):
+    """Where an image lives: output_dir/filename, or output_dir/<prefix>/filename."""
+    if not sharded:
+        return os.path.join(output_dir, filename)
+    return os.path.join(output_dir, shard_prefix(os.path.splitext(filename)[0]), filename)
+
+
+def iter_story_files(stories_dir=STORIES_DIR):
+    """Yield every story path, in slug order, one directory listing at a time."""
+    for root, dirs, files in os.walk(stories_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.mdx'):
+                yield Path(root, name)
+
+
+def load_legacy_prompts(path=LEGACY_PROMPTS):
+    """{image id: prompt} from the old hand-written prompt file, if it exists.
+
+    Keyed by id rather than filename, so a story whose artwork was saved as
+    009.png still finds the prompt written for 009.jpg.
+    """
+    try:
+        with open(path, 'r') as f:
+            return {os.path.splitext(item["filename"])[0]: item["prompt"]
+                    for item in json.load(f)}
+    except (OSError, ValueError):
+        return {}
+
+
+def story_entry(path, stories_dir, legacy):
+    """The catalog entry for one story file, or None if it has no image."""
+    data = read_front_matter(path)
+    img = data.get('img')
+    if not img:
+        return None
+    slug = path.relative_to(stories_dir).with_suffix('').as_posix()
+    title = data.get('title') or slug
+    image_id = os.path.splitext(img)[0]
+    prompt = data.get('prompt') or legacy.get(image_id) or PROMPT_TEMPLATE.format(title=title)
+    return {"id": image_id, "slug": slug, "title": title,
+            "prompt": prompt, "filename": img}
+
+
+def _entry_key(entry):
+    return entry["id"], entry["slug"]
+
+
+def _write_shard(path, entries, stats):
+    entries.sort(key=_entry_key)
+    return stats.write(path, ''.join(json.dumps(entry, ensure_ascii=False) + '\n'
+                                     for entry in entries))
+
+
+def build_catalog(stories_dir=STORIES_DIR, catalog_dir=CATALOG_DIR, legacy_path=LEGACY_PROMPTS):
+    """Rebuild every shard from the stories. Returns (entries, WriteStats)."""
+    legacy = load_legacy_prompts(legacy_path)
+    stories_dir = Path(stories_dir)
+    os.makedirs(catalog_dir, exist_ok=True)
+    count = 0
+    stats = WriteStats()
+
+    # Spool entries into one file per shard, then sort and write shards one by one
+    with tempfile.TemporaryDirectory(prefix=".spool-", dir=catalog_dir) as spool:
+        spools = {}
+        try:
+            for path in iter_story_files(stories_dir):
+                entry = story_entry(path, stories_dir, legacy)
+                if entry is None:
+                    continue
+                prefix = shard_prefix(entry["id"])
+                if prefix not in spools:
+                    spools[prefix] = open(os.path.join(spool, prefix), 'w', encoding='utf-8')
+                spools[prefix].write(json.dumps(entry, ensure_ascii=False) + '\n')
+                count += 1
+        finally:
+            for f in spools.values():
+                f.close()
+
+        for prefix in sorted(spools):
+            with open(os.path.join(spool, prefix), 'r', encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f]
+            _write_shard(os.path.join(catalog_dir, f"{prefix}.jsonl"), entries, stats)
+
+    for name in os.listdir(catalog_dir):
+        if name.endswith('.jsonl') and name[:-len('.jsonl')] not in spools:
+            os.remove(os.path.join(catalog_dir, name))
+    return count, stats
+
+
+def update_stories(paths, stories_dir=STORIES_DIR, catalog_dir=CATALOG_DIR,
+                   legacy_path=LEGACY_PROMPTS):
+    """Refresh the entries of a few changed (or deleted) stories in place.
+
+    Only shards that held or now hold one of those stories are rewritten.
+    Returns the set of shard prefixes that changed.
+    """
+    legacy = load_legacy_prompts(legacy_path)
+    stories_dir = Path(stories_dir)
+    slugs = set()
+    fresh = {}
+    for path in map(Path, paths):
+        slugs.add(path.relative_to(stories_dir).with_suffix('').as_posix())
+        entry = story_entry(path, stories_dir, legacy) if path.exists() else None
+        if entry is not None:
+            fresh.setdefault(shard_prefix(entry["id"]), []).append(entry)
+
+    os.makedirs(catalog_dir, exist_ok=True)
+    prefixes = {name[:-len('.jsonl')] for name in os.listdir(catalog_dir)
+                if name.endswith('.jsonl')} | set(fresh)
+    stats = WriteStats()
+    changed = set()
+    for prefix in sorted(prefixes):
+        path = os.path.join(catalog_dir, f"{prefix}.jsonl")
+        entries = list(iter_shard(path)) if os.path.exists(path) else []
+        kept = [entry for entry in entries if entry["slug"] not in slugs]
+        if len(kept) == len(entries) and prefix not in fresh:
+            continue
+        kept += fresh.get(prefix, [])
+        if not kept:
+            os.remove(path)
+            changed.add(prefix)
+        elif _write_shard(path, kept, stats) != "unchanged":
+            changed.add(prefix)
+    return changed
+
+
+def iter_shard(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_catalog(catalog_dir=CATALOG_DIR, ids=None, prefixes=None):
+    """Stream catalog entries in id order, reading only the shards needed for
+    ids (or the given shard prefixes) when those are passed."""
+    wanted = set(prefixes or ()) | {shard_prefix(i) for i in ids or ()}
+    for name in sorted(os.listdir(catalog_dir)):
+        prefix, ext = os.path.splitext(name)
+        if ext != '.jsonl' or (wanted and prefix not in wanted):
+            continue
+        for entry in iter_shard(os.path.join(catalog_dir, name)):
+            if ids is None or entry["id"] in ids:
+                yield entry
+
+
+def iter_images(catalog_dir=CATALOG_DIR, ids=None, prefixes=None):
+    """Like iter_catalog, but one entry per image file (the first story using it)."""
+    last = None
+    # Entries for the same image sort next to each other within a shard
+    for entry in iter_catalog(catalog_dir, ids, prefixes):
+        if entry["filename"] != last:
+            last = entry["filename"]
+            yield entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the image prompt catalog.")
+    parser.add_argument("--catalog-dir", default=CATALOG_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="derive the catalog from story front-matter")
+    build.add_argument("--stories-dir", default=STORIES_DIR)
+    build.add_argument("--legacy", default=LEGACY_PROMPTS,
+                       help="old prompt file used for stories without a prompt: field")
+    get = sub.add_parser("get", help="print the entries for image ids")
+    get.add_argument("ids", nargs="+")
+    listing = sub.add_parser("list", help="list one line per image")
+    listing.add_argument("--missing-prompts", action="store_true",
+                         help="only images whose prompt comes from the template")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count, stats = build_catalog(args.stories_dir, args.catalog_dir, args.legacy)
+        print(f"Catalogued {count} stories into {args.catalog_dir}/ ({stats.summary()})")
+    elif args.command == "get":
+        for entry in iter_catalog(args.catalog_dir, ids=set(args.ids)):
+            print(json.dumps(entry, indent=2, ensure_ascii=False))
+    else:
+        for entry in iter_images(args.catalog_dir):
+            if (not args.missing_prompts
+                    or entry["prompt"] == PROMPT_TEMPLATE.format(title=entry["title"])):
+                print(f"{entry['filename']}: {entry['title']}")
+
+
+if __name__ == '__main__':
+    main()
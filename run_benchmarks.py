@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the content-generation scripts.
+
+Each benchmark is run at several scales (50, 500 and 5,000 items by default)
+in a fresh process, against synthetic inputs in a temporary directory. For
+every run it records wall time, per-item latency percentiles and the peak RSS
+of the process, and writes everything to a JSON file.
+
+Pass --compare with an earlier results file to fail (exit 1) when wall time
+or median per-item latency regressed by more than --threshold.
+
+    python run_benchmarks.py
+    python run_benchmarks.py --scales 50,500 --only themed_placeholders
+    python run_benchmarks.py --compare benchmark_baseline.json --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RESULTS_PATH = "benchmark_results.json"
+
+SCALES = (50, 500, 5000)
+
+SAMPLE_TITLES = [
+    "My First Day in Minecraft", "Building with Steve", "The Space Mission",
+    "Pikachu's Big Day", "A Very Long Title About a Trip to the Mountains With Friends",
+    "Soccer Practice", "Heroes Save the Day",
+]
+
+
+# Each benchmark returns (items, run_item) or (items, run_item, finish):
+# run_item(item) is timed once per item, and finish() is included in wall time
+
+def bench_themed_placeholders(n, tmp):
+    import create_themed_placeholders as themed
+    fonts = themed.load_fonts()
+    stories = [{"id": f"{i % 60 + 1:03d}", "title": SAMPLE_TITLES[i % len(SAMPLE_TITLES)],
+                "filename": f"{i:05d}.jpg"} for i in range(n)]
+    return stories, lambda story: themed.create_placeholder(story, tmp, fonts)
+
+
+def bench_themed_placeholders_writer(n, tmp):
+    import create_themed_placeholders as themed
+    from image_writer import ImageWriter
+    fonts = themed.load_fonts()
+    stories = [{"id": f"{i % 60 + 1:03d}", "title": SAMPLE_TITLES[i % len(SAMPLE_TITLES)],
+                "filename": f"{i:05d}.jpg"} for i in range(n)]
+    writer = ImageWriter()
+
+    def run(story):
+        img = themed.render_story(story, fonts)
+        writer.submit(img, os.path.join(tmp, story['filename']), 'JPEG', **themed.JPEG_PARAMS)
+    return stories, run, writer.close
+
+
+def bench_blend_images(n, tmp):
+    import create_blend_images as blends
+    from content_writer import save_image
+    names = [blends.blend_filenames[i % len(blends.blend_filenames)] for i in range(n)]
+
+    def run(item):
+        i, name = item
+        img = blends.render_blend(name)
+        save_image(img, os.path.join(tmp, f"{i:05d}-{name}.jpg"), 'JPEG')
+    return list(enumerate(names)), run
+
+
+def bench_blend_images_writer(n, tmp):
+    import create_blend_images as blends
+    from image_writer import ImageWriter
+    names = [blends.blend_filenames[i % len(blends.blend_filenames)] for i in range(n)]
+    writer = ImageWriter()
+
+    def run(item):
+        i, name = item
+        writer.submit(blends.render_tile(name),
+                      os.path.join(tmp, f"{i:05d}-{blends.tile_filename(name)}"),
+                      blends.TILE_FORMAT, optimize=True)
+    return list(enumerate(names)), run, writer.close
+
+
+def bench_single_image(n, tmp):
+    import generate_single_image as single
+    items = [(f"{i:03d}", SAMPLE_TITLES[i % len(SAMPLE_TITLES)]) for i in range(n)]
+
+    def run(item):
+        story_id, title = item
+        single.generate_custom_image(story_id, title, os.path.join(tmp, f"{story_id}.jpg"))
+    return items, run
+
+
+def bench_text_layout(n, tmp):
+    import create_themed_placeholders as themed
+    from text_layout import fit_text
+    # Titles of growing length so most need wrapping and shrinking
+    words = " ".join(SAMPLE_TITLES).split()
+    titles = [" ".join(words[j % len(words)] for j in range(i, i + 5 + i % 40))
+              for i in range(n)]
+    return titles, lambda title: fit_text(title, themed.TITLE_BOX, themed.TITLE_MAX_SIZE,
+                                          themed.TITLE_MIN_SIZE)
+
+
+def bench_blend_mdx(n, tmp):
+    import create_blend_mdx_files as blend_mdx
+    from content_writer import write_if_changed
+
+    # One item is one run of the script: parse the blend data, render every
+    # page and write the ones that changed (after the first run, none do)
+    def run(i):
+        for filename, content in blend_mdx.build_pages(blend_mdx.data).items():
+            write_if_changed(os.path.join(tmp, filename), content)
+    return range(n), run
+
+
+def bench_story_listing(n, tmp):
+    from list_stories import index_entry
+    stories_dir = Path(tmp) / "stories"
+    sample = Path("app/public/content/stories/small/001.mdx").read_text(encoding='utf-8')
+    paths = []
+    for i in range(n):
+        path = stories_dir / ("small" if i % 2 else "big") / f"{i:05d}.mdx"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(sample, encoding='utf-8')
+        paths.append(path)
+    return paths, lambda path: index_entry(path, stories_dir, path.stat())
+
+
+BENCHMARKS = {
+    "themed_placeholders": bench_themed_placeholders,
+    "themed_placeholders_writer": bench_themed_placeholders_writer,
+    "blend_images": bench_blend_images,
+    "blend_images_writer": bench_blend_images_writer,
+    "single_image": bench_single_image,
+    "text_layout": bench_text_layout,
+    "blend_mdx": bench_blend_mdx,
+    "story_listing": bench_story_listing,
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_case(name, n):
+    """Run one benchmark at one scale. Meant to be called in a fresh process."""
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as tmp:
+        items, run_item, *finish = BENCHMARKS[name](n, tmp)
+        latencies = []
+        # The generators print a line per file; keep that out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for item in items:
+                t0 = time.perf_counter()
+                run_item(item)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            for hook in finish:
+                hook()
+            wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "items": n,
+        "wall_s": round(wall, 4),
+        "per_item_ms": {
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p90": round(percentile(latencies, 90), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human-readable regressions against a baseline results file."""
+    regressions = []
+    for name, scales in results["results"].items():
+        for scale, current in scales.items():
+            previous = baseline.get("results", {}).get(name, {}).get(scale)
+            if not previous:
+                continue
+            checks = [("wall_s", current["wall_s"], previous["wall_s"]),
+                      ("p50", current["per_item_ms"]["p50"], previous["per_item_ms"]["p50"])]
+            for metric, now, before in checks:
+                if before > 0 and now > before * (1 + threshold):
+                    regressions.append(f"{name}@{scale} {metric}: {before} -> {now} "
+                                       f"(+{(now / before - 1) * 100:.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the content-generation scripts.")
+    parser.add_argument("--scales", default=",".join(str(s) for s in SCALES),
+                        help="comma-separated item counts")
+    parser.add_argument("--only", default=None,
+                        help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--compare", default=None,
+                        help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    scales = [int(s) for s in args.scales.split(",")]
+
+    # Read the baseline before anything is written: --output may be the same file
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read baseline {args.compare}: {e}")
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+
+    # A fresh process per case keeps peak RSS and warm caches from leaking between runs
+    ctx = multiprocessing.get_context("spawn")
+    for name in names:
+        results["results"][name] = {}
+        for n in scales:
+            with ctx.Pool(1) as pool:
+                result = pool.apply(run_case, (name, n))
+            results["results"][name][str(n)] = result
+            print(f"{name:>20} x{n:<6} wall {result['wall_s']:>9.3f}s  "
+                  f"p50 {result['per_item_ms']['p50']:>8.3f}ms  "
+                  f"p99 {result['per_item_ms']['p99']:>8.3f}ms  "
+                  f"rss {result['peak_rss_kb'] // 1024}MB")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    print(f"\nResults written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Render custom story covers from declarative scene specs.
+
+Each scene in story_scenes.json describes one cover as a background colour
+plus a stack of layers drawn in order:
+
+    {"id": "007", "title": "Bad Mobs at Night", "filename": "007.jpg",
+     "background": [50, 50, 50],
+     "layers": [
+       {"type": "starfield", "count": 100, "color": [200, 200, 200],
+        "region": [0, 0, 1, 0.5]},
+       {"type": "moon", "box": [650, 50, 750, 150], "fill": [240, 240, 210]},
+       {"type": "title", "box": [40, 170, 760, 500], "max_size": 70}]}
+
+Layer types (see LAYERS): sky, starfield, moon, ground, blocks, title, text.
+Regions are fractions of the image (left, top, right, bottom); boxes are
+pixels. Random placement comes from a NumPy generator seeded from the scene's
+"seed" (default: derived from its id) and the layer's position in the stack,
+so a scene always renders to the same pixels, and adding a layer does not
+reshuffle the others. Particle and block layers are drawn as whole arrays
+rather than with one draw call per point.
+
+Because output is deterministic, every cover is recorded in the build
+manifest with its full spec, and unchanged scenes are skipped:
+
+    python scene_renderer.py                 # every scene
+    python scene_renderer.py 007 --force     # just these ids
+"""
+
+from PIL import Image, ImageDraw
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from build_manifest import BuildManifest, manifest_path_for
+from content_writer import WriteStats, save_image
+from font_registry import font_id, get_font
+from image_writer import ImageWriter
+from text_layout import draw_layout, fit_text
+import tracing
+from tracing import span
+
+SCENES_PATH = "story_scenes.json"
+output_dir = "app/public/story-images"
+
+WIDTH, HEIGHT = 800, 600
+
+# Bump whenever the drawing code changes so existing outputs are rebuilt
+RENDERER_VERSION = 3
+
+
+def scene_seed(scene):
+    """The scene's seed, or a stable one derived from its id (never hash())."""
+    if "seed" in scene:
+        return int(scene["seed"])
+    return int.from_bytes(hashlib.sha256(str(scene["id"]).encode('utf-8')).digest()[:8], 'little')
+
+
+def _region(layer, size, default=(0, 0, 1, 1)):
+    width, height = size
+    left, top, right, bottom = layer.get("region", default)
+    return (round(left * width), round(top * height),
+            max(round(left * width) + 1, round(right * width)),
+            max(round(top * height) + 1, round(bottom * height)))
+
+
+def draw_sky(img, layer, scene, rng):
+    """Vertical gradient from "top" to "bottom" colour over the region."""
+    left, top, right, bottom = _region(layer, img.size)
+    t = np.linspace(0, 1, bottom - top)[:, None]
+    colors = (1 - t) * np.array(layer["top"]) + t * np.array(layer["bottom"])
+    band = np.repeat(colors[:, None, :], right - left, axis=1)
+    pixels = np.array(img)
+    pixels[top:bottom, left:right] = np.round(band).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+
+def draw_starfield(img, layer, scene, rng):
+    """"count" stars of "size" pixels scattered over the region; "twinkle" dims
+    each star by a random fraction up to that amount."""
+    left, top, right, bottom = _region(layer, img.size, (0, 0, 1, 0.5))
+    count = layer.get("count", 100)
+    size = layer.get("size", 1)
+    xs = rng.integers(left, right, count)
+    ys = rng.integers(top, bottom, count)
+    brightness = 1 - layer.get("twinkle", 0) * rng.random(count)
+    colors = np.round(np.array(layer.get("color", (200, 200, 200)))
+                      * brightness[:, None]).astype(np.uint8)
+
+    # Every pixel of every star in one fancy-indexed assignment
+    offsets = np.arange(size)
+    px = np.clip(xs[:, None, None] + offsets[None, None, :], 0, img.width - 1)
+    py = np.clip(ys[:, None, None] + offsets[None, :, None], 0, img.height - 1)
+    px, py = np.broadcast_arrays(px, py)
+    pixels = np.array(img)
+    pixels[py, px] = colors[:, None, None, :]
+    return Image.fromarray(pixels)
+
+
+def draw_moon(img, layer, scene, rng):
+    """A disc in "box"; with "crescent", the disc minus a copy shifted right by
+    that many pixels, so whatever is behind it shows through the shadow."""
+    box = layer["box"]
+    fill = tuple(layer.get("fill", (240, 240, 210)))
+    shift = layer.get("crescent")
+    if not shift:
+        outline = tuple(layer["outline"]) if "outline" in layer else None
+        ImageDraw.Draw(img).ellipse(box, fill=fill, outline=outline)
+        return img
+    mask = Image.new('L', img.size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse(box, fill=255)
+    draw.ellipse([box[0] + shift, box[1], box[2] + shift, box[3]], fill=0)
+    img.paste(fill, mask=mask)
+    return img
+
+
+def draw_ground(img, layer, scene, rng):
+    """A band from "top" (pixels) to the bottom in "color", with per-pixel
+    brightness noise of up to +/- "jitter"."""
+    top = layer["top"]
+    height = img.height - top
+    noise = rng.integers(-layer.get("jitter", 0), layer.get("jitter", 0) + 1,
+                         (height, img.width, 1))
+    pixels = np.array(img)
+    pixels[top:] = np.clip(np.array(layer["color"]) + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+
+def draw_blocks(img, layer, scene, rng):
+    """Square blocks of "block" pixels from "top" to the bottom: the first row
+    uses colors[0] and deeper rows pick from the rest, each block shaded by up
+    to +/- "jitter", with a darker "edge" line between blocks."""
+    top = layer["top"]
+    block = layer.get("block", 40)
+    palette = np.array(layer["colors"])
+    rows = -(-(img.height - top) // block)
+    cols = -(-img.width // block)
+
+    choice = np.zeros((rows, cols), dtype=np.int64)
+    if len(palette) > 1 and rows > 1:
+        choice[1:] = rng.integers(1, len(palette), (rows - 1, cols))
+    jitter = layer.get("jitter", 0)
+    shade = rng.integers(-jitter, jitter + 1, (rows, cols, 1))
+    grid = np.clip(palette[choice] + shade, 0, 255)
+
+    # Blow each block up to block x block pixels and darken its edges
+    tiles = np.repeat(np.repeat(grid, block, axis=0), block, axis=1)
+    edge = layer.get("edge", 0)
+    if edge:
+        lines = np.zeros(tiles.shape[:2], dtype=bool)
+        lines[::block] = True
+        lines[:, ::block] = True
+        tiles[lines] = np.clip(tiles[lines] - edge, 0, 255)
+    pixels = np.array(img)
+    pixels[top:] = tiles[:img.height - top, :img.width].astype(np.uint8)
+    return Image.fromarray(pixels)
+
+
+def draw_title(img, layer, scene, rng):
+    """The story title, wrapped and shrunk to fit "box"."""
+    with span("text_measure"):
+        layout = fit_text(scene["title"], layer["box"], layer.get("max_size", 70),
+                          layer.get("min_size"), max_lines=layer.get("max_lines"))
+    with span("draw_text"):
+        draw_layout(ImageDraw.Draw(img), layout, fill=tuple(layer.get("color", (255, 255, 255))),
+                    stroke_width=layer.get("stroke_width", 0),
+                    stroke_fill=tuple(layer.get("stroke_fill", (0, 0, 0))))
+    return img
+
+
+def draw_text(img, layer, scene, rng):
+    """Fixed text at "position" with a Pillow "anchor"; {id} and {title} are filled in."""
+    text = layer["text"].format(id=scene["id"], title=scene.get("title", ""))
+    with span("draw_text"):
+        ImageDraw.Draw(img).text(tuple(layer["position"]), text,
+                                 fill=tuple(layer.get("color", (255, 255, 255))),
+                                 font=get_font(layer.get("size", 30)),
+                                 anchor=layer.get("anchor", "la"),
+                                 stroke_width=layer.get("stroke_width", 0),
+                                 stroke_fill=tuple(layer.get("stroke_fill", (0, 0, 0))))
+    return img
+
+
+LAYERS = {
+    "sky": draw_sky,
+    "starfield": draw_starfield,
+    "moon": draw_moon,
+    "ground": draw_ground,
+    "blocks": draw_blocks,
+    "title": draw_title,
+    "text": draw_text,
+}
+
+
+def render_scene(scene):
+    """Draw a scene spec and return the image."""
+    size = tuple(scene.get("size", (WIDTH, HEIGHT)))
+    img = Image.new('RGB', size, color=tuple(scene.get("background", (0, 0, 0))))
+    seed = scene_seed(scene)
+    for i, layer in enumerate(scene.get("layers", [])):
+        draw = LAYERS.get(layer["type"])
+        if draw is None:
+            raise ValueError(f"Scene {scene['id']}: unknown layer type {layer['type']!r}")
+        # One generator per layer, so each layer's randomness is independent
+        rng = np.random.default_rng([seed, i])
+        with span(layer["type"]):
+            img = draw(img, layer, scene, rng)
+    return img
+
+
+def scene_inputs(scene):
+    """Everything that affects a cover, for the build manifest."""
+    return {
+        "scene": scene,
+        "seed": scene_seed(scene),
+        "font": font_id(),
+        "renderer": RENDERER_VERSION,
+    }
+
+
+def load_scenes(path=SCENES_PATH):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _render_in_worker(scene, path):
+    return path, save_image(render_scene(scene), path, 'JPEG'), tracing.drain()
+
+
+def render_all(scenes, output_dir, workers=1, manifest=None, dry_run=False, force=False):
+    """Render every out-of-date scene, serially or across a process pool."""
+    pending = []
+    unchanged = 0
+    for scene in scenes:
+        path = os.path.join(output_dir, scene["filename"])
+        inputs = scene_inputs(scene)
+        if manifest is not None and not force and manifest.is_current(path, inputs):
+            unchanged += 1
+            continue
+        pending.append((scene, path, inputs))
+
+    if unchanged:
+        print(f"{unchanged} scenes unchanged")
+    if dry_run:
+        for _, path, _ in pending:
+            print(f"Would create {path}")
+        return
+
+    stats = WriteStats()
+
+    def written(path, status, inputs):
+        print(f"{status.capitalize()} {path}")
+        if manifest is not None:
+            manifest.record(path, inputs)
+
+    if workers <= 1 or len(pending) <= 1:
+        with ImageWriter(stats=stats) as writer:
+            for scene, path, inputs in pending:
+                writer.submit(render_scene(scene), path, 'JPEG',
+                              on_done=lambda path, status, inputs=inputs:
+                                  written(path, status, inputs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=tracing.configure,
+                                 initargs=tracing.worker_config()) as pool:
+            results = pool.map(_render_in_worker, [scene for scene, _, _ in pending],
+                               [path for _, path, _ in pending])
+            for (path, status, events), (_, _, inputs) in zip(results, pending):
+                tracing.extend(events)
+                written(path, stats.add(status), inputs)
+
+    if manifest is not None:
+        manifest.save()
+    if pending:
+        print(f"Scenes: {stats.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render custom story covers from scene specs.")
+    parser.add_argument("ids", nargs="*", help="only render these story ids")
+    parser.add_argument("--scenes", default=SCENES_PATH)
+    parser.add_argument("--output-dir", default=output_dir)
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="number of render processes (0 = one per CPU core)")
+    parser.add_argument("--manifest", default=None,
+                        help="build manifest path (default: alongside the output directory)")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every cover even if its scene is unchanged")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the covers that would be rebuilt and exit")
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    tracing.start(args)
+
+    scenes = load_scenes(args.scenes)
+    if args.ids:
+        unknown = set(args.ids) - {scene["id"] for scene in scenes}
+        if unknown:
+            parser.error(f"no scene for id(s): {', '.join(sorted(unknown))}")
+        scenes = [scene for scene in scenes if scene["id"] in args.ids]
+
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    manifest = BuildManifest(args.manifest or manifest_path_for(args.output_dir))
+    workers = args.workers or os.cpu_count() or 1
+    render_all(scenes, args.output_dir, workers, manifest, args.dry_run, args.force)
+    tracing.finish(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the content build.
+
+    python storybook.py build              # incremental build of everything
+    python storybook.py build --force      # rerun every stage
+    python storybook.py build --dry-run    # show what would run
+    python storybook.py build --strict     # validator warnings also fail the build
+    python storybook.py build blend_mdx    # one stage plus what it depends on
+    python storybook.py stages             # list stages and their dependencies
+    python storybook.py watch              # rebuild affected artifacts on every edit
+
+Each generator script is a stage with declared inputs, outputs and upstream
+stages. Stages run as soon as their dependencies finish, independent ones in
+parallel. A stage is skipped when the hash of its inputs (file contents plus
+its command) matches the last successful run and its outputs exist; since a
+stage's inputs include its upstream outputs, downstream stages only rerun
+when something upstream actually changed.
+
+Image prompts come from the prompt catalog stage (prompt_catalog.py), which
+derives them from the stories' front-matter; story_image_prompts.json is only
+read there as the legacy source of prompt text, and generate_story_images.py
+(which would overwrite it) is left out of the build.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess  # nosec B404
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+STATE_PATH = ".storybook-build.json"
+
+STORY_IMAGES = "app/public/story-images"
+STORIES = "app/public/content/stories"
+BLENDS = "app/public/content/consonant-blends"
+PROMPT_CATALOG = "story_prompts"
+
+WORD_LISTS = ["app/public/content/small-words.txt", "app/public/content/big-words.txt",
+              "app/public/content/words.txt", "SightWords_tmp.md"]
+
+# Shared modules every image generator imports
+IMAGE_LIBS = ["build_manifest.py", "content_writer.py", "font_registry.py", "image_writer.py",
+              "text_layout.py", "tracing.py"]
+
+
+class Stage:
+    def __init__(self, name, command, inputs, outputs, deps=(), exclude=()):
+        self.name = name
+        self.command = command
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+        # Path fragments ignored when hashing input directories
+        self.exclude = exclude
+
+
+STAGES = [
+    Stage("prompts", ["prompt_catalog.py", "build"],
+          inputs=["prompt_catalog.py", "frontmatter.py", "list_stories.py", "content_writer.py",
+                  "tracing.py", "story_image_prompts.json", STORIES],
+          outputs=[PROMPT_CATALOG]),
+    Stage("placeholders", ["create_themed_placeholders.py", "-j", "0"],
+          inputs=["create_themed_placeholders.py", "prompt_catalog.py", "scene_renderer.py",
+                  "optimize_images.py", "story_scenes.json", PROMPT_CATALOG] + IMAGE_LIBS,
+          outputs=[STORY_IMAGES],
+          deps=["prompts"]),
+    Stage("scenes", ["scene_renderer.py"],
+          inputs=["scene_renderer.py", "story_scenes.json"] + IMAGE_LIBS,
+          outputs=[STORY_IMAGES]),
+    Stage("blend_mdx", ["create_blend_mdx_files.py"],
+          inputs=["create_blend_mdx_files.py", "blend_trie.py", "content_writer.py", "tracing.py"],
+          outputs=[BLENDS]),
+    Stage("blend_images", ["create_blend_images.py"],
+          inputs=["create_blend_images.py", "blend_trie.py"] + IMAGE_LIBS,
+          outputs=[STORY_IMAGES]),
+    Stage("story_index", ["list_stories.py"],
+          inputs=["list_stories.py", "frontmatter.py", STORIES],
+          outputs=["app/public/content/stories-index.json"]),
+    Stage("highlights", ["highlight_words.py"],
+          inputs=["highlight_words.py", "word_lists.py", "list_stories.py", "content_writer.py",
+                  "tracing.py", STORIES] + WORD_LISTS,
+          outputs=["app/public/content/highlights"]),
+    Stage("bundle", ["content_bundle.py", "build"],
+          inputs=["content_bundle.py", "frontmatter.py", "content_writer.py", "tracing.py",
+                  STORIES, BLENDS],
+          outputs=["app/public/content/content.bundle"],
+          deps=["blend_mdx"]),
+    Stage("derivatives", ["create_image_derivatives.py"],
+          inputs=["create_image_derivatives.py", "build_manifest.py", "content_writer.py",
+                  "tracing.py", STORY_IMAGES],
+          outputs=[os.path.join(STORY_IMAGES, "derived", "srcset.json")],
+          deps=["placeholders", "scenes", "blend_images"],
+          exclude=("derived", ".manifest.json", ".lock")),
+    # Last gate before deploy: fails the build on broken front-matter or missing
+    # images (and, with build --strict, on warnings)
+    Stage("validate", ["validate_content.py"],
+          inputs=["validate_content.py", "frontmatter.py", "highlight_words.py", "word_lists.py",
+                  STORIES, BLENDS, STORY_IMAGES] + WORD_LISTS,
+          outputs=[".content-validation.json"],
+          deps=["story_index", "placeholders", "scenes", "blend_mdx", "blend_images"],
+          exclude=("derived", ".manifest.json", ".lock")),
+]
+
+
+def _hash_path(h, path, exclude):
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in exclude)
+            for name in sorted(files):
+                if any(fragment in name for fragment in exclude):
+                    continue
+                _hash_path(h, os.path.join(root, name), exclude)
+    elif os.path.exists(path):
+        h.update(path.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    else:
+        h.update(f"missing:{path}".encode('utf-8'))
+
+
+def stage_hash(stage):
+    """Hash of a stage's command and the contents of all its inputs."""
+    h = hashlib.sha256(json.dumps(stage.command).encode('utf-8'))
+    for path in stage.inputs:
+        _hash_path(h, path, stage.exclude)
+    return h.hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def select_stages(names):
+    """The named stages plus everything they depend on, in declaration order."""
+    by_name = {stage.name: stage for stage in STAGES}
+    if not names:
+        return list(STAGES)
+    wanted = set()
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if name not in by_name:
+            raise SystemExit(f"Unknown stage: {name}")
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(by_name[name].deps)
+    return [stage for stage in STAGES if stage.name in wanted]
+
+
+def run_stage(stage, verbose=False):
+    """Run one stage's script. Returns (returncode, seconds, output)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + stage.command,  # nosec B603
+                            capture_output=not verbose, text=True, check=False)
+    output = (result.stdout or '') + (result.stderr or '')
+    return result.returncode, time.perf_counter() - start, output
+
+
+def build(stages, workers=None, force=False, dry_run=False, verbose=False):
+    """Run stages respecting dependencies. Returns True if every stage succeeded."""
+    state = load_state()
+    selected = {stage.name for stage in stages}
+    pending = {stage.name: stage for stage in stages}
+    done = set()
+    # Stages a dry run would run; their dependents would rerun too
+    would_run = set()
+    failed = set()
+    running = {}
+
+    def ready(stage):
+        deps = [d for d in stage.deps if d in selected]
+        return all(d in done for d in deps)
+
+    with ThreadPoolExecutor(max_workers=workers or len(stages) or 1) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(d in failed for d in stage.deps):
+                    print(f"[{name}] skipped: an upstream stage failed")
+                    failed.add(name)
+                    del pending[name]
+                    continue
+                if not ready(stage):
+                    continue
+                del pending[name]
+
+                digest = stage_hash(stage)
+                up_to_date = (state.get(name) == digest and
+                              all(os.path.exists(path) for path in stage.outputs))
+                upstream = [d for d in stage.deps if d in would_run]
+                if up_to_date and not force and not upstream:
+                    print(f"[{name}] up to date")
+                    done.add(name)
+                    continue
+                if dry_run:
+                    after = f" (after {', '.join(upstream)})" if upstream else ""
+                    print(f"[{name}] would run: {' '.join(stage.command)}{after}")
+                    would_run.add(name)
+                    done.add(name)
+                    continue
+                print(f"[{name}] running: {' '.join(stage.command)}")
+                running[pool.submit(run_stage, stage, verbose)] = stage
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                returncode, seconds, output = future.result()
+                if returncode == 0:
+                    # Hash again after the run so the stage's own outputs that
+                    # feed back into its inputs do not make it look stale
+                    state[stage.name] = stage_hash(stage)
+                    save_state(state)
+                    done.add(stage.name)
+                    print(f"[{stage.name}] done in {seconds:.1f}s")
+                else:
+                    failed.add(stage.name)
+                    print(f"[{stage.name}] FAILED (exit {returncode}) after {seconds:.1f}s")
+                    if output:
+                        print(output.rstrip())
+
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storybook content build.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="run the content build")
+    build_parser.add_argument("stages", nargs="*",
+                              help="only these stages (and their dependencies)")
+    build_parser.add_argument("--force", action="store_true",
+                              help="run stages even if their inputs are unchanged")
+    build_parser.add_argument("--dry-run", action="store_true",
+                              help="show which stages would run")
+    build_parser.add_argument("-j", "--jobs", type=int, default=None,
+                              help="maximum stages to run at once")
+    build_parser.add_argument("-v", "--verbose", action="store_true",
+                              help="stream each stage's output")
+    build_parser.add_argument("--strict", action="store_true",
+                              help="fail the validate stage on warnings too")
+
+    sub.add_parser("stages", help="list the build stages")
+
+    watch_parser = sub.add_parser("watch", help="incrementally rebuild what each edit affects")
+    watch_parser.add_argument("--poll", action="store_true",
+                              help="poll file mtimes instead of using inotify")
+    watch_parser.add_argument("--debounce", type=float, default=0.1,
+                              help="seconds of quiet to wait for before rebuilding")
+    args = parser.parse_args()
+
+    if args.command == "watch":
+        # Imported here: the watcher loads the generators, fonts and word lists
+        from watch import watch
+        watch(args.poll, args.debounce)
+        return
+
+    if args.command == "stages":
+        for stage in STAGES:
+            deps = f" (after {', '.join(stage.deps)})" if stage.deps else ""
+            print(f"{stage.name:<14} {' '.join(stage.command)}{deps}")
+        return
+
+    stages = select_stages(args.stages)
+    if args.strict:
+        # A separate command, so a strict run is not "up to date" after a lenient one
+        stages = [Stage(s.name, s.command + ["--strict"], s.inputs, s.outputs, s.deps, s.exclude)
+                  if s.name == "validate" else s for s in stages]
+    ok = build(stages, args.jobs, args.force, args.dry_run, args.verbose)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Shared text measurement and layout for the image generators.
+
+Measuring a string with draw.textbbox() renders it, so wrapping a title by
+re-measuring the growing line after every word is quadratic in its length.
+Instead, each (font, size) gets a TextMetrics that caches the advance width of
+every glyph and the kerning of every adjacent pair the first time they are
+seen; after that a string's width is a sum of cached numbers, and a whole
+title wraps in one linear pass.
+
+fit_text() picks the largest font size (by binary search) at which a text
+wraps into a box, and returns a Layout of positioned lines ready to draw:
+
+    layout = fit_text(title, (50, 120, 750, 480), max_size=40, min_size=20)
+    draw_layout(draw, layout, fill=colors['text'], stroke_width=2, stroke_fill=(0, 0, 0))
+"""
+
+import functools
+
+from font_registry import DEFAULT_FONT, FONT_CACHE_SIZE, get_font
+
+
+class TextMetrics:
+    """Advance widths and kerning for one font at one size, filled in lazily."""
+
+    def __init__(self, font):
+        self.font = font
+        self.advances = {}
+        self.kerning = {}
+        ascent, descent = font.getmetrics()
+        self.line_height = ascent + descent
+
+    def advance(self, ch):
+        width = self.advances.get(ch)
+        if width is None:
+            width = self.advances[ch] = self.font.getlength(ch)
+        return width
+
+    def kern(self, a, b):
+        pair = a + b
+        adjust = self.kerning.get(pair)
+        if adjust is None:
+            adjust = self.kerning[pair] = (self.font.getlength(pair)
+                                           - self.advance(a) - self.advance(b))
+        return adjust
+
+    def width(self, text):
+        """Advance width of text, as font.getlength(text) would report it."""
+        total = 0.0
+        prev = None
+        for ch in text:
+            total += self.advance(ch)
+            if prev is not None:
+                total += self.kern(prev, ch)
+            prev = ch
+        return total
+
+
+# Bounded like the font cache, so a caller passing fresh font objects cannot grow it forever
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def metrics_for(font):
+    """The shared TextMetrics for a font object (get_font returns cached fonts)."""
+    return TextMetrics(font)
+
+
+def wrap(text, metrics, max_width):
+    """Greedily break text into lines no wider than max_width, in one pass.
+
+    Returns [(line, width)]. A single word wider than max_width gets a line of
+    its own (and the caller can tell from its width that it does not fit).
+    """
+    lines = []
+    words = []
+    line_width = 0.0
+    space = metrics.advance(' ')
+    for word in text.split():
+        word_width = metrics.width(word)
+        if words:
+            # Joining adds a space plus the kerning either side of it
+            joined = (line_width + space + word_width
+                      + metrics.kern(words[-1][-1], ' ') + metrics.kern(' ', word[0]))
+            if joined <= max_width:
+                words.append(word)
+                line_width = joined
+                continue
+            lines.append((' '.join(words), line_width))
+        words = [word]
+        line_width = word_width
+    if words:
+        lines.append((' '.join(words), line_width))
+    return lines
+
+
+class Layout:
+    """Lines of text positioned inside a box: lines is [(text, x, y)]."""
+
+    def __init__(self, font, size, lines, fits):
+        self.font = font
+        self.size = size
+        self.lines = lines
+        self.fits = fits
+
+
+def _wrap_to_box(text, metrics, box_width, box_height, line_spacing, max_lines):
+    lines = wrap(text, metrics, box_width)
+    step = metrics.line_height * line_spacing
+    height = metrics.line_height + step * (len(lines) - 1) if lines else 0
+    fits = (all(width <= box_width for _, width in lines) and height <= box_height
+            and (max_lines is None or len(lines) <= max_lines))
+    return lines, step, height, fits
+
+
+def fit_text(text, box, max_size, min_size=None, name=DEFAULT_FONT, line_spacing=1.25,
+             max_lines=None, align="center"):
+    """Lay text out in box (left, top, right, bottom) at the largest size that fits.
+
+    Sizes from min_size to max_size are binary searched; if even min_size does
+    not fit, the text is laid out at min_size anyway with fits=False. Lines
+    are centred vertically, and horizontally unless align is "left".
+    """
+    left, top, right, bottom = box
+    box_width, box_height = right - left, bottom - top
+    min_size = min_size or max_size
+
+    def attempt(size):
+        metrics = metrics_for(get_font(size, name))
+        return metrics, _wrap_to_box(text, metrics, box_width, box_height,
+                                     line_spacing, max_lines)
+
+    best = None
+    low, high = min_size, max_size
+    while low <= high:
+        size = (low + high) // 2
+        metrics, result = attempt(size)
+        if result[3]:
+            best = size, metrics, result
+            low = size + 1
+        else:
+            high = size - 1
+    if best is None:
+        best = (min_size, *attempt(min_size))
+    size, metrics, (lines, step, height, fits) = best
+
+    y = top + (box_height - height) / 2
+    positioned = []
+    for line, width in lines:
+        x = left if align == "left" else left + (box_width - width) / 2
+        positioned.append((line, round(x), round(y)))
+        y += step
+    return Layout(metrics.font, size, positioned, fits)
+
+
+def draw_layout(draw, layout, **kwargs):
+    """Draw every line of a Layout; kwargs go to draw.text (fill, stroke, ...)."""
+    for line, x, y in layout.lines:
+        draw.text((x, y), line, font=layout.font, **kwargs)
@@ -0,0 +1,139 @@
+"""
+Lightweight per-stage tracing for the generators.
+
+Wrap a phase in `with span("encode"):` and, when tracing is enabled, it is
+recorded as a Chrome trace event (load the output in chrome://tracing or
+Perfetto to see the build timeline). When tracing is off a span costs one
+flag check.
+
+Opt-in modes, wired into each generator's command line by add_arguments():
+    --trace trace.json     write a Chrome trace of every span
+    --trace-memory         also record tracemalloc current/peak memory per span
+    --profile build.prof   run the whole script under cProfile
+
+Worker processes record into their own buffer; hand worker_config() to the
+pool initializer, call configure() there, and return drain() with each
+result so the parent can extend() its trace.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+_enabled = False
+_memory = False
+_events = []
+_profiler = None
+
+
+def configure(enabled=True, memory=False):
+    global _enabled, _memory
+    _enabled = enabled
+    _memory = memory and enabled
+    if _memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def worker_config():
+    """Arguments for configure() in a pool worker, matching this process."""
+    return _enabled, _memory
+
+
+def enabled():
+    return _enabled
+
+
+@contextmanager
+def span(name, /, **args):
+    """Record the duration of the enclosed block as a trace event."""
+    if not _enabled:
+        yield
+        return
+    if _memory:
+        tracemalloc.reset_peak()
+        mem_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        if _memory:
+            current, peak = tracemalloc.get_traced_memory()
+            args = dict(args, mem_delta=current - mem_before, mem_peak=peak)
+        event = {
+            "name": name,
+            "cat": "storybook",
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        _events.append(event)
+
+
+def drain():
+    """Return and clear the events recorded so far (used by pool workers)."""
+    events = _events[:]
+    del _events[:]
+    return events
+
+
+def extend(events):
+    _events.extend(events)
+
+
+def write(path):
+    with open(path, 'w') as f:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms"}, f)
+
+
+def summary():
+    """Total milliseconds and call count per span name, slowest first."""
+    totals = defaultdict(lambda: [0.0, 0])
+    for event in _events:
+        totals[event["name"]][0] += event["dur"] / 1000
+        totals[event["name"]][1] += 1
+    return sorted(((name, ms, count) for name, (ms, count) in totals.items()),
+                  key=lambda row: -row[1])
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("tracing")
+    group.add_argument("--trace", metavar="PATH", default=None,
+                       help="write a Chrome trace (JSON) of every build phase")
+    group.add_argument("--trace-memory", action="store_true",
+                       help="record tracemalloc memory per phase (with --trace)")
+    group.add_argument("--profile", metavar="PATH", default=None,
+                       help="run under cProfile and write stats to PATH")
+
+
+def start(args):
+    """Enable tracing/profiling as requested on the command line."""
+    global _profiler
+    if args.trace:
+        configure(True, args.trace_memory)
+    if args.profile:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def finish(args):
+    """Write the trace and profile requested on the command line."""
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(args.profile)
+        print(f"Profile written to {args.profile}", file=sys.stderr)
+    if args.trace:
+        write(args.trace)
+        print(f"Trace written to {args.trace}", file=sys.stderr)
+        for name, ms, count in summary():
+            print(f"  {name:<20} {ms:>10.1f} ms  ({count} spans)", file=sys.stderr)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Check every story and blend page before deploying.
+
+Per file:
+- front-matter is present and has a title and an img, and an id (the app's
+  getStoryData warns without one, so a missing id is a warning)
+- the image exists in app/public/story-images, opens, and has sane dimensions,
+  and is not ambiguous (another file with the same name but a different
+  extension, e.g. 009.jpg next to 009.png)
+- every <u>-highlighted word is in a word list that applies to the story's
+  wordType (see highlight_words.HIGHLIGHT_LISTS)
+
+Across files: no two pages in a directory share an id or slug.
+
+Results are cached per file in .content-validation.json, keyed by the hash of
+the file's bytes and of the word lists; a file whose size and mtime are
+unchanged is not even re-read, so a full check after a small edit only
+re-validates that edit. Stale files are checked in a process pool.
+
+Exits 1 when there are errors (or, with --strict, warnings).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from frontmatter import split_front_matter
+from highlight_words import HIGHLIGHT_LISTS, TAG_RE
+from word_lists import WORD_LIST_PATHS, load_word_lists
+
+CONTENT_DIR = "app/public/content"
+IMAGE_DIR = "app/public/story-images"
+CACHE_PATH = ".content-validation.json"
+
+COLLECTIONS = ("stories/small", "stories/big", "consonant-blends")
+
+REQUIRED_FIELDS = ("title", "img")
+# Fields the app expects but can render without
+EXPECTED_FIELDS = ("id",)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".avif")
+
+MIN_SIDE, MAX_SIDE = 200, 8192
+MAX_ASPECT = 3.0
+
+# Bump whenever the checks change so cached results are discarded
+VALIDATOR_VERSION = 2
+
+HIGHLIGHT_RE = re.compile(r'<u>(.*?)</u>', re.S)
+
+ERROR = "error"
+WARNING = "warning"
+
+
+def _hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def word_lists_hash():
+    h = hashlib.sha256(str(VALIDATOR_VERSION).encode('utf-8'))
+    for name, path in sorted(WORD_LIST_PATHS.items()):
+        h.update(name.encode('utf-8'))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+# Word lists for pool workers, loaded once by _init_worker
+_word_sets = None
+
+
+def _init_worker(word_sets):
+    global _word_sets
+    _word_sets = word_sets
+
+
+def check_file(path, collection, word_sets=None):
+    """Content checks for one MDX file that depend only on its own bytes.
+
+    Returns {"meta": {...}, "issues": [[level, message]]}.
+    """
+    word_sets = word_sets if word_sets is not None else _word_sets
+    issues = []
+    text = Path(path).read_text(encoding='utf-8')
+    data, body = split_front_matter(text)
+    if not data:
+        issues.append([ERROR, "missing or unterminated front-matter"])
+    for field in REQUIRED_FIELDS:
+        if not data.get(field):
+            issues.append([ERROR, f"missing required front-matter field '{field}'"])
+    for field in EXPECTED_FIELDS:
+        if data and not data.get(field):
+            issues.append([WARNING, f"missing front-matter field '{field}'"])
+
+    word_type = data.get('wordType') or data.get('workType')
+    if collection.startswith("stories/"):
+        word_type = word_type or collection.split('/')[1]
+        if word_type != collection.split('/')[1]:
+            issues.append([WARNING, f"wordType '{word_type}' does not match its "
+                                    f"directory '{collection}'"])
+    allowed = HIGHLIGHT_LISTS.get(word_type, tuple(word_sets))
+    unknown = set()
+    for match in HIGHLIGHT_RE.finditer(body):
+        word = TAG_RE.sub('', match.group(1)).strip().lower()
+        if word and not any(word in word_sets.get(name, ()) for name in allowed):
+            unknown.add(word)
+    if unknown:
+        issues.append([WARNING, f"highlighted words not in the {'/'.join(allowed)} lists: "
+                                f"{', '.join(sorted(unknown))}"])
+
+    return {
+        "meta": {"id": str(data.get('id') or Path(path).stem), "img": data.get('img')},
+        "issues": issues,
+    }
+
+
+def _check_in_worker(path, collection):
+    return check_file(path, collection)
+
+
+def check_image(name, image_dir, by_stem):
+    """Issues for a referenced image: existence, ambiguity and dimensions."""
+    issues = []
+    path = os.path.join(image_dir, name)
+    stem, ext = os.path.splitext(name)
+    siblings = sorted(n for n in by_stem.get(stem, ()) if n != name)
+    if not os.path.exists(path):
+        hint = f" (found {', '.join(siblings)})" if siblings else ""
+        return [[ERROR, f"image '{name}' does not exist{hint}"]]
+    if siblings:
+        issues.append([WARNING, f"image '{name}' is ambiguous with {', '.join(siblings)}"])
+    if ext.lower() not in IMAGE_EXTENSIONS:
+        issues.append([WARNING, f"image '{name}' has an unexpected extension"])
+    try:
+        # Only the header is read; the pixels are never decoded
+        with Image.open(path) as img:
+            width, height = img.size
+    except Exception as e:
+        return issues + [[ERROR, f"image '{name}' cannot be opened: {e}"]]
+    if (min(width, height) < MIN_SIDE or max(width, height) > MAX_SIDE
+            or max(width, height) / min(width, height) > MAX_ASPECT):
+        issues.append([WARNING, f"image '{name}' is {width}x{height}"])
+    return issues
+
+
+def load_cache(path):
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get("version") == VALIDATOR_VERSION else {}
+
+
+def save_cache(path, cache):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def validate(content_dir=CONTENT_DIR, image_dir=IMAGE_DIR, cache_path=CACHE_PATH, workers=0):
+    """Check every page. Returns ([(path, level, message)], files re-checked)."""
+    lists_hash = word_lists_hash()
+    cache = load_cache(cache_path)
+    cached_files = cache.get("files", {}) if cache.get("lists") == lists_hash else {}
+
+    files = []
+    for collection in COLLECTIONS:
+        for path in sorted(Path(content_dir, collection).glob('*.mdx')):
+            files.append((str(path), collection))
+
+    results = {}
+    stale = []
+    for path, collection in files:
+        stat = os.stat(path)
+        entry = cached_files.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            results[path] = entry
+            continue
+        with open(path, 'rb') as f:
+            digest = _hash_bytes(f.read())
+        if entry and entry["sha"] == digest:
+            results[path] = dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns)
+            continue
+        stale.append((path, collection, stat, digest))
+
+    if stale:
+        word_sets = {name: {w.lower() for w in words}
+                     for name, words in load_word_lists().items()}
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(stale) > 16:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(word_sets,)) as pool:
+                checked = list(pool.map(_check_in_worker, [s[0] for s in stale],
+                                        [s[1] for s in stale], chunksize=8))
+        else:
+            checked = [check_file(path, collection, word_sets)
+                       for path, collection, _, _ in stale]
+        for (path, _, stat, digest), result in zip(stale, checked):
+            results[path] = dict(result, sha=digest, size=stat.st_size, mtime=stat.st_mtime_ns)
+
+    save_cache(cache_path, {"version": VALIDATOR_VERSION, "lists": lists_hash,
+                            "files": results})
+
+    issues = []
+    for path, _ in files:
+        issues.extend((path, level, message) for level, message in results[path]["issues"])
+
+    # Images are checked every run (they change independently of the pages),
+    # but only once per distinct image
+    by_stem = defaultdict(list)
+    if os.path.isdir(image_dir):
+        for name in os.listdir(image_dir):
+            by_stem[os.path.splitext(name)[0]].append(name)
+    image_issues = {}
+    for path, _ in files:
+        img = results[path]["meta"]["img"]
+        if img:
+            if img not in image_issues:
+                image_issues[img] = check_image(img, image_dir, by_stem)
+            issues.extend((path, level, message) for level, message in image_issues[img])
+
+    # id and slug collisions within each directory
+    for collection in COLLECTIONS:
+        seen_ids = defaultdict(list)
+        seen_slugs = defaultdict(list)
+        for path, c in files:
+            if c == collection:
+                seen_ids[results[path]["meta"]["id"]].append(path)
+                seen_slugs[Path(path).stem.lower()].append(path)
+        for kind, seen in (("id", seen_ids), ("slug", seen_slugs)):
+            for key, paths in seen.items():
+                if len(paths) > 1:
+                    for path in paths:
+                        others = ', '.join(os.path.basename(p) for p in paths if p != path)
+                        issues.append((path, ERROR, f"{kind} '{key}' also used by {others}"))
+
+    return issues, len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate story and blend content.")
+    parser.add_argument("--content-dir", default=CONTENT_DIR)
+    parser.add_argument("--image-dir", default=IMAGE_DIR)
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("-j", "--workers", type=int, default=0,
+                        help="processes for re-checking changed files (0 = one per CPU core)")
+    parser.add_argument("--strict", action="store_true", help="treat warnings as errors")
+    parser.add_argument("--quiet", action="store_true", help="only print errors")
+    parser.add_argument("--json", action="store_true", help="print issues as JSON")
+    args = parser.parse_args()
+
+    issues, rechecked = validate(args.content_dir, args.image_dir, args.cache, args.workers)
+    errors = [issue for issue in issues if issue[1] == ERROR]
+    warnings = [issue for issue in issues if issue[1] == WARNING]
+
+    if args.json:
+        print(json.dumps([{"path": p, "level": level, "message": m} for p, level, m in issues],
+                         indent=2))
+    else:
+        for path, level, message in issues:
+            if level == ERROR or not args.quiet:
+                print(f"{path}: {level}: {message}")
+        print(f"\n{len(errors)} errors, {len(warnings)} warnings ({rechecked} files re-checked)")
+
+    if errors or (args.strict and warnings):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
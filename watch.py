@@ -0,0 +1,325 @@
+"""
+Watch the content sources and rebuild only what each change affects.
+
+    python storybook.py watch
+    python storybook.py watch --poll      # stat polling instead of inotify
+
+Changes are collected until the tree has been quiet for the debounce window
+(so an editor's save-rename-chmod burst is one rebuild), then each changed
+file is mapped to the artifacts derived from it:
+
+- a story MDX added, edited or deleted: its highlight sidecar, its entry in
+  stories-index.json, its prompt catalog shard and placeholder image (if its
+  title changed), and the content bundle
+- story_image_prompts.json (the legacy prompts): the prompt catalog, and the
+  placeholders whose entries changed
+- create_blend_mdx_files.py (the blend data): the blend pages that changed,
+  tiles for new pages, and the content bundle
+- a word list: every highlight sidecar (the lists apply to every story)
+- story_scenes.json: the covers whose scene spec changed
+
+Everything runs in this process, which keeps the fonts, theme backgrounds,
+word lists and highlight automaton loaded between rebuilds, so a typical
+edit is reflected in tens of milliseconds. Changes to generator code are not
+watched; run `python storybook.py build` after those.
+
+On Linux the watcher uses inotify directly through ctypes (no extra
+packages); elsewhere, or with --poll, it compares file sizes and mtimes.
+"""
+
+import ctypes
+import ctypes.util
+import importlib
+import os
+import select
+import struct
+import sys
+import time
+import traceback
+from pathlib import Path
+
+import create_blend_images
+import create_blend_mdx_files
+import create_themed_placeholders
+import highlight_words
+import list_stories
+import prompt_catalog
+import scene_renderer
+from build_manifest import BuildManifest, manifest_path_for
+from content_bundle import BUNDLE_PATH, collect_entries, compile_bundle
+from content_writer import UNCHANGED, WriteStats, write_if_changed
+from word_lists import WORD_LIST_PATHS, load_word_lists
+
+PROMPTS_PATH = prompt_catalog.LEGACY_PROMPTS
+SCENES_PATH = scene_renderer.SCENES_PATH
+BLEND_SOURCE = "create_blend_mdx_files.py"
+STORIES = "app/public/content/stories"
+BLENDS = "app/public/content/consonant-blends"
+STORY_IMAGES = "app/public/story-images"
+
+WATCHED = [PROMPTS_PATH, SCENES_PATH, BLEND_SOURCE, STORIES] + list(WORD_LIST_PATHS.values())
+
+DEBOUNCE = 0.1
+POLL_INTERVAL = 0.25
+
+# inotify(7) flags
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Directory watches via inotify; files are watched through their parent
+    directory so editors that save by renaming are still seen."""
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        self.files = set()
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, _ in os.walk(path):
+                    self._watch(root)
+            else:
+                self.files.add(os.path.normpath(path))
+                self._watch(os.path.dirname(path) or ".")
+
+    def _watch(self, directory):
+        directory = os.path.normpath(directory)
+        if directory in self.dirs.values():
+            return
+        wd = self._add_watch(self.fd, directory.encode(), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        self.dirs[wd] = directory
+
+    def _wanted(self, path):
+        return path in self.files or any(
+            path.startswith(root + os.sep) for root in WATCHED if os.path.isdir(root))
+
+    def wait(self, timeout=None):
+        """Changed paths, blocking up to timeout seconds (None: until a change)."""
+        changed = set()
+        while not changed:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return changed
+            data = os.read(self.fd, 65536)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+                offset += EVENT.size + length
+                if wd not in self.dirs:
+                    continue
+                path = os.path.normpath(os.path.join(self.dirs[wd], name.decode()))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and self._wanted(path):
+                        self._watch(path)
+                    continue
+                if self._wanted(path):
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher comparing (size, mtime) snapshots of the watched paths."""
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        self.paths = paths
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for path in self.paths:
+            files = [str(p) for p in Path(path).rglob('*') if p.is_file()] \
+                if os.path.isdir(path) else [path]
+            for name in files:
+                try:
+                    stat = os.stat(name)
+                except OSError:
+                    continue
+                snapshot[os.path.normpath(name)] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(self.interval if deadline is None
+                       else min(self.interval, max(0, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+
+class Rebuilder:
+    """Warm state for incremental rebuilds, plus the change-to-artifact mapping."""
+
+    def __init__(self):
+        self.manifest = BuildManifest(manifest_path_for(STORY_IMAGES))
+        # get_font caches, so this loads the fonts once for every later rebuild
+        create_themed_placeholders.load_fonts()
+        if not os.path.isdir(prompt_catalog.CATALOG_DIR):
+            prompt_catalog.build_catalog()
+        self._load_word_lists()
+
+    def _load_word_lists(self):
+        self.word_lists = load_word_lists()
+        self.automaton, _ = highlight_words.build_automaton(self.word_lists)
+
+    def handle(self, paths):
+        """Rebuild everything derived from the changed paths. Returns a summary."""
+        stories = sorted(p for p in paths if p.endswith('.mdx') and p.startswith(STORIES))
+        actions = []
+        if PROMPTS_PATH in paths:
+            actions.append(self.prompts_changed)
+        if paths & {os.path.normpath(p) for p in WORD_LIST_PATHS.values()}:
+            actions.append(self.word_lists_changed)
+        if stories:
+            actions.append(lambda: self.stories_changed(stories))
+        if BLEND_SOURCE in paths:
+            actions.append(self.blends_changed)
+        if SCENES_PATH in paths:
+            actions.append(self.scenes_changed)
+
+        bundle = False
+        summary = []
+        for action in actions:
+            try:
+                done, rebundle = action()
+            except Exception:
+                # Keep watching; a half-typed edit should not end the session
+                traceback.print_exc()
+                continue
+            summary.append(done)
+            bundle = bundle or rebundle
+        if bundle:
+            status = write_if_changed(BUNDLE_PATH, compile_bundle(collect_entries()))
+            summary.append(f"bundle {status}")
+        return "; ".join(summary)
+
+    def prompts_changed(self):
+        # The manifest holds each placeholder's title, so only changed ones render
+        prompt_catalog.build_catalog()
+        create_themed_placeholders.create_all(prompt_catalog.iter_images(), STORY_IMAGES, 1,
+                                              self.manifest,
+                                              exclude=create_themed_placeholders.custom_covers())
+        return "prompt catalog", False
+
+    def scenes_changed(self):
+        # The manifest holds each cover's full spec, so only edited scenes render
+        scenes = scene_renderer.load_scenes()
+        scene_renderer.render_all(scenes, STORY_IMAGES, 1, self.manifest)
+        return f"{len(scenes)} scenes checked", False
+
+    def stories_changed(self, paths):
+        stats = WriteStats()
+        for path in paths:
+            self._highlight(Path(path), stats)
+        list_stories.build_index()
+        shards = prompt_catalog.update_stories(paths)
+        if shards:
+            create_themed_placeholders.create_all(
+                prompt_catalog.iter_images(prefixes=shards), STORY_IMAGES, 1, self.manifest,
+                exclude=create_themed_placeholders.custom_covers())
+        return f"{len(paths)} stories, index, highlights {stats.summary()}", True
+
+    def word_lists_changed(self):
+        self._load_word_lists()
+        stats = WriteStats()
+        for path in sorted(Path(STORIES).rglob('*.mdx')):
+            self._highlight(path, stats)
+        return f"word lists, highlights {stats.summary()}", False
+
+    def _highlight(self, path, stats):
+        slug = path.relative_to(STORIES).with_suffix('').as_posix()
+        if not path.exists():
+            sidecar = os.path.join(highlight_words.SIDECAR_DIR, f"{slug}.json")
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+            return
+        slug, _, _, spans, lists = highlight_words.highlight_story(
+            path, Path(STORIES), self.automaton, self.word_lists)
+        highlight_words.write_sidecar(highlight_words.SIDECAR_DIR, slug, spans, lists, stats)
+
+    def blends_changed(self):
+        # The blend data lives in the script itself, so reload it to pick up the edit
+        blend_mdx = importlib.reload(create_blend_mdx_files)
+        stats = WriteStats()
+        changed = []
+        for filename, content in blend_mdx.build_pages(blend_mdx.data).items():
+            if stats.write(os.path.join(BLENDS, filename), content) != UNCHANGED:
+                changed.append(filename)
+
+        tiles = 0
+        for filename in changed:
+            name = filename[:-len('.mdx')]
+            path = os.path.join(STORY_IMAGES, create_blend_images.tile_filename(name))
+            inputs = create_blend_images.blend_inputs(name)
+            if not self.manifest.is_current(path, inputs):
+                stats.save_image(create_blend_images.render_tile(name), path,
+                                 create_blend_images.TILE_FORMAT, optimize=True)
+                self.manifest.record(path, inputs)
+                tiles += 1
+        if tiles:
+            self.manifest.save()
+        return f"{len(changed)} blend pages, {tiles} tiles", bool(changed)
+
+
+def make_watcher(paths, poll=False):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except OSError as e:
+            print(f"inotify unavailable ({e}); polling instead")
+    return PollingWatcher(paths)
+
+
+def watch(poll=False, debounce=DEBOUNCE):
+    """Rebuild on every change until interrupted."""
+    start = time.perf_counter()
+    rebuilder = Rebuilder()
+    watcher = make_watcher([path for path in WATCHED if os.path.exists(path)], poll)
+    print(f"Watching {', '.join(WATCHED)} with {type(watcher).__name__} "
+          f"(ready in {time.perf_counter() - start:.2f}s)")
+    try:
+        while True:
+            changed = watcher.wait()
+            # Debounce: keep collecting until nothing changes for a whole window
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            start = time.perf_counter()
+            summary = rebuilder.handle({os.path.normpath(p) for p in changed})
+            if summary:
+                print(f"{time.strftime('%H:%M:%S')} {summary} "
+                      f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
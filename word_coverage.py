@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Story x word coverage: which stories practise which words, and which don't.
+
+Every story is tokenized once into word counts, and the counts are assembled
+into a sparse story-by-word matrix in compressed sparse row form (indptr,
+indices, counts as NumPy arrays, the same layout as scipy.sparse.csr_matrix;
+to_scipy() converts when SciPy is installed). A column-major copy answers
+"which stories use this word" without scanning rows.
+
+Queries join the matrix with the word lists (small, big, words, sight) and
+the consonant-blend pages (blend:br, blend:final-st, ...):
+
+    python word_coverage.py stories bright            # stories that use "bright"
+    python word_coverage.py freq bright cave          # total uses and story counts
+    python word_coverage.py gaps blend:br             # BR words in no story
+    python word_coverage.py coverage small sight      # share of each list used
+    python word_coverage.py top --n 20 --outside      # common words in no list
+
+Per-story counts are cached in .word-coverage/ keyed by each file's content
+hash (files with an unchanged size and mtime are not re-read), and the built
+matrix is cached keyed by all of them, so a query normally just loads arrays,
+and editing one story re-tokenizes only that story.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from frontmatter import split_front_matter
+from highlight_words import TAG_RE, TOKEN_RE
+from list_stories import STORIES_DIR
+from word_lists import load_word_lists
+
+BLENDS_DIR = "app/public/content/consonant-blends"
+CACHE_DIR = ".word-coverage"
+
+# Bump whenever tokenization changes so cached counts are discarded
+TOKENIZER_VERSION = 1
+
+
+def tokenize(text):
+    """Lower-cased word counts of a story body (front-matter and <u> tags removed)."""
+    _, body = split_front_matter(text)
+    return Counter(token.lower() for token in TOKEN_RE.findall(TAG_RE.sub('', body)))
+
+
+def blend_lists(blends_dir=BLENDS_DIR):
+    """{"blend:br": [words], ...} from the blend pages' comma-separated word lines."""
+    lists = {}
+    for path in sorted(Path(blends_dir).glob('*-words.mdx')):
+        _, body = split_front_matter(path.read_text(encoding='utf-8'))
+        words = [w.strip().lower() for line in body.split('\n')
+                 if ',' in line for w in line.split(',') if w.strip()]
+        lists[f"blend:{path.stem[:-len('-words')]}"] = words
+    return lists
+
+
+def all_lists():
+    lists = {name: [w.lower() for w in words] for name, words in load_word_lists().items()}
+    lists.update(blend_lists())
+    return lists
+
+
+class CoverageMatrix:
+    """Sparse story-by-word count matrix (CSR rows, plus a CSC copy for columns)."""
+
+    def __init__(self, stories, vocab, indptr, indices, counts):
+        self.stories = stories
+        self.vocab = vocab
+        self.word_index = {word: i for i, word in enumerate(vocab)}
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        # Column-major view: for each word, the rows (stories) that use it
+        order = np.argsort(indices, kind='stable')
+        rows = np.repeat(np.arange(len(stories), dtype=np.int32), np.diff(indptr))
+        self.col_rows = rows[order]
+        self.col_counts = counts[order]
+        self.col_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=len(vocab)), out=self.col_ptr[1:])
+        self.totals = np.bincount(indices, weights=counts, minlength=len(vocab)).astype(np.int64)
+        self.story_counts = np.diff(self.col_ptr)
+
+    @classmethod
+    def from_counts(cls, story_counts):
+        """Build from {slug: Counter}."""
+        stories = sorted(story_counts)
+        vocab = sorted({word for counts in story_counts.values() for word in counts})
+        index = {word: i for i, word in enumerate(vocab)}
+        indptr = np.zeros(len(stories) + 1, dtype=np.int64)
+        indices = []
+        counts = []
+        for row, slug in enumerate(stories):
+            items = sorted((index[word], n) for word, n in story_counts[slug].items())
+            indices.extend(i for i, _ in items)
+            counts.extend(n for _, n in items)
+            indptr[row + 1] = len(indices)
+        return cls(stories, vocab, indptr, np.array(indices, dtype=np.int32),
+                   np.array(counts, dtype=np.int32))
+
+    def to_scipy(self):
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.counts, self.indices, self.indptr),
+                          shape=(len(self.stories), len(self.vocab)))
+
+    def stories_with(self, word):
+        """[(slug, count)] of the stories using word, most uses first."""
+        col = self.word_index.get(word.lower())
+        if col is None:
+            return []
+        start, end = self.col_ptr[col], self.col_ptr[col + 1]
+        rows, counts = self.col_rows[start:end], self.col_counts[start:end]
+        order = np.argsort(-counts, kind='stable')
+        return [(self.stories[rows[i]], int(counts[i])) for i in order]
+
+    def frequency(self, word):
+        """(total uses, number of stories) for word."""
+        col = self.word_index.get(word.lower())
+        if col is None:
+            return 0, 0
+        return int(self.totals[col]), int(self.story_counts[col])
+
+    def story_words(self, slug):
+        row = self.stories.index(slug)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return {self.vocab[i]: int(n) for i, n in zip(self.indices[start:end],
+                                                      self.counts[start:end])}
+
+    def gaps(self, words):
+        """The words (in order, deduplicated) that no story uses."""
+        return [w for w in dict.fromkeys(w.lower() for w in words) if w not in self.word_index]
+
+    def coverage(self, words):
+        """(covered words, total distinct words) for a list."""
+        distinct = list(dict.fromkeys(w.lower() for w in words))
+        return sum(1 for w in distinct if w in self.word_index), len(distinct)
+
+    def top(self, n, exclude=()):
+        """The n most used words, skipping any in exclude."""
+        exclude = set(exclude)
+        result = []
+        for col in np.argsort(-self.totals, kind='stable'):
+            word = self.vocab[col]
+            if word not in exclude:
+                result.append((word, int(self.totals[col]), int(self.story_counts[col])))
+                if len(result) == n:
+                    break
+        return result
+
+    def save(self, directory, key):
+        np.savez(os.path.join(directory, "matrix.npz"), indptr=self.indptr,
+                 indices=self.indices, counts=self.counts)
+        with open(os.path.join(directory, "matrix.json"), 'w') as f:
+            json.dump({"key": key, "stories": self.stories, "vocab": self.vocab}, f)
+
+    @classmethod
+    def load(cls, directory, key):
+        try:
+            with open(os.path.join(directory, "matrix.json"), 'r') as f:
+                meta = json.load(f)
+            if meta["key"] != key:
+                return None
+            arrays = np.load(os.path.join(directory, "matrix.npz"))
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(meta["stories"], meta["vocab"], arrays["indptr"], arrays["indices"],
+                   arrays["counts"])
+
+
+def load_matrix(stories_dir=STORIES_DIR, cache_dir=CACHE_DIR, rebuild=False):
+    """The coverage matrix for stories_dir, updated incrementally. Returns (matrix, re-read)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    counts_path = os.path.join(cache_dir, "stories.json")
+    cached = {}
+    if not rebuild:
+        try:
+            with open(counts_path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == TOKENIZER_VERSION:
+                cached = data["stories"]
+        except (OSError, ValueError):
+            pass
+
+    stories_dir = Path(stories_dir)
+    entries = {}
+    reread = 0
+    for path in sorted(stories_dir.rglob('*.mdx')):
+        slug = path.relative_to(stories_dir).with_suffix('').as_posix()
+        stat = path.stat()
+        entry = cached.get(slug)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            entries[slug] = entry
+            continue
+        raw = path.read_bytes()
+        sha = hashlib.sha256(raw).hexdigest()
+        if not entry or entry["sha"] != sha:
+            entry = {"sha": sha, "counts": tokenize(raw.decode('utf-8'))}
+            reread += 1
+        entries[slug] = dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns)
+
+    key = hashlib.sha256(json.dumps(
+        [TOKENIZER_VERSION] + [[slug, entries[slug]["sha"]] for slug in sorted(entries)]
+    ).encode('utf-8')).hexdigest()
+
+    if entries != cached:
+        tmp_path = f"{counts_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": TOKENIZER_VERSION, "stories": entries}, f,
+                      separators=(',', ':'))
+        os.replace(tmp_path, counts_path)
+
+    matrix = None if rebuild else CoverageMatrix.load(cache_dir, key)
+    if matrix is None:
+        matrix = CoverageMatrix.from_counts({slug: entry["counts"]
+                                             for slug, entry in entries.items()})
+        matrix.save(cache_dir, key)
+    return matrix, reread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query which stories practise which words.")
+    parser.add_argument("--stories-dir", default=STORIES_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="ignore cached counts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stories = sub.add_parser("stories", help="stories that use a word")
+    stories.add_argument("words", nargs="+")
+    freq = sub.add_parser("freq", help="total uses and story count of words")
+    freq.add_argument("words", nargs="+")
+    gaps = sub.add_parser("gaps", help="words of a list that no story uses")
+    gaps.add_argument("lists", nargs="+", help="small, big, words, sight or blend:<name>")
+    coverage = sub.add_parser("coverage", help="share of each list used by the stories")
+    coverage.add_argument("lists", nargs="*", help="default: every list")
+    top = sub.add_parser("top", help="most used words")
+    top.add_argument("--n", type=int, default=20)
+    top.add_argument("--outside", action="store_true", help="only words in no list")
+    args = parser.parse_args()
+
+    matrix, reread = load_matrix(args.stories_dir, args.cache_dir, args.rebuild)
+
+    if args.command == "stories":
+        for word in args.words:
+            found = matrix.stories_with(word)
+            listing = ", ".join(f"{slug} ({n})" for slug, n in found) or "none"
+            print(f"{word}: {listing}")
+
+    elif args.command == "freq":
+        for word in args.words:
+            total, n_stories = matrix.frequency(word)
+            print(f"{word}: {total} uses in {n_stories} stories")
+
+    elif args.command in ("gaps", "coverage"):
+        lists = all_lists()
+        names = args.lists or list(lists)
+        unknown = [name for name in names if name not in lists]
+        if unknown:
+            parser.error(f"unknown list(s): {', '.join(unknown)}")
+        for name in names:
+            if args.command == "gaps":
+                missing = matrix.gaps(lists[name])
+                print(f"{name}: {len(missing)} words in no story: {', '.join(missing)}")
+            else:
+                covered, total = matrix.coverage(lists[name])
+                share = covered / total * 100 if total else 0
+                print(f"{name:<18} {covered:>5}/{total:<5} {share:5.1f}% used in stories")
+
+    elif args.command == "top":
+        exclude = set()
+        if args.outside:
+            for words in all_lists().values():
+                exclude.update(words)
+        for word, total, n_stories in matrix.top(args.n, exclude):
+            print(f"{word:<20} {total:>6} uses in {n_stories} stories")
+
+    if reread:
+        print(f"\n({reread} stories re-tokenized)")
+
+
+if __name__ == '__main__':
+    main()
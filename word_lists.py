@@ -0,0 +1,58 @@
+"""
+Loaders for the word lists the stories are written against.
+
+- small-words.txt / big-words.txt / words.txt: one word per line
+- SightWords_tmp.md: comma-separated words under "## A", "## B", ... headings
+"""
+
+import os
+
+CONTENT_DIR = "app/public/content"
+
+WORD_LIST_PATHS = {
+    "small": os.path.join(CONTENT_DIR, "small-words.txt"),
+    "big": os.path.join(CONTENT_DIR, "big-words.txt"),
+    "words": os.path.join(CONTENT_DIR, "words.txt"),
+    "sight": "SightWords_tmp.md",
+}
+
+
+def read_word_file(path):
+    """Words from a one-word-per-line file, in file order."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def read_sight_words(path):
+    """Words from the sight-word markdown file, in file order."""
+    words = []
+    in_section = False
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('## '):
+                in_section = True
+            elif line.startswith('#'):
+                in_section = False
+            elif in_section and line:
+                words.extend(w.strip() for w in line.split(',') if w.strip())
+                # Each letter section is a single line of words
+                in_section = False
+    return words
+
+
+def load_word_list(name, path=None):
+    path = path or WORD_LIST_PATHS[name]
+    if path.endswith('.md'):
+        return read_sight_words(path)
+    return read_word_file(path)
+
+
+def load_word_lists(names=None):
+    """{list name: words} for every list that exists on disk."""
+    lists = {}
+    for name in names or WORD_LIST_PATHS:
+        path = WORD_LIST_PATHS[name]
+        if os.path.exists(path):
+            lists[name] = load_word_list(name, path)
+    return lists
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Keep the word lists sorted and deduplicated, and bulk-load words into them.
+
+Lists are ordered case-insensitively (as the add-sight-word route sorts them)
+and deduplicated ignoring case, keeping the spelling already in the list.
+A WordList holds the words with a parallel list of case-folded keys, so
+membership is a bisect (O(log n)), and a bulk import is a single
+heapq.merge of the existing list with the sorted new words followed by one
+write, instead of a read-sort-write cycle per word.
+
+    python word_store.py normalize                  # sort and dedupe every list
+    python word_store.py import small new-words.txt # merge a file into a list
+    python word_store.py check bright cave          # which lists have these words
+    python word_store.py duplicates                 # words in more than one list
+
+Import files may hold one word per line or comma-separated words; '-' reads
+stdin. Imported words are lower-cased unless --keep-case is given (the sight
+list keeps proper nouns like "America").
+"""
+
+import argparse
+import heapq
+import sys
+from bisect import bisect_left
+from itertools import combinations
+
+from content_writer import write_if_changed
+from word_lists import WORD_LIST_PATHS, load_word_list
+
+
+def word_key(word):
+    return word.casefold()
+
+
+class WordList:
+    """A sorted, case-insensitively deduplicated list of words."""
+
+    def __init__(self, words=()):
+        self.words = []
+        self.keys = []
+        self.merge(words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __contains__(self, word):
+        key = word_key(word)
+        i = bisect_left(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    def merge(self, words):
+        """Merge any iterable of words in one sorted pass. Returns the number added."""
+        incoming = {}
+        for word in words:
+            word = word.strip()
+            if word:
+                incoming.setdefault(word_key(word), word)
+        new = sorted(incoming.items())
+
+        merged_words = []
+        merged_keys = []
+        # heapq.merge is stable, so on equal keys the existing spelling comes first
+        for key, word in heapq.merge(zip(self.keys, self.words), new, key=lambda kw: kw[0]):
+            if merged_keys and merged_keys[-1] == key:
+                continue
+            merged_keys.append(key)
+            merged_words.append(word)
+        added = len(merged_words) - len(self.words)
+        self.words, self.keys = merged_words, merged_keys
+        return added
+
+
+def render_word_file(words):
+    # The app writes these files without a trailing newline
+    return '\n'.join(words)
+
+
+def render_sight_words(words, original):
+    """Rewrite the sight-word markdown: the title and any closing text are kept,
+    and the words are regrouped under one "## X" heading per initial letter."""
+    lines = original.split('\n')
+    sections = [i for i, line in enumerate(lines) if line.startswith('## ')]
+    if sections:
+        prologue = lines[:sections[0]]
+        # Each section is its heading plus a single line of words
+        epilogue = lines[sections[-1] + 2:]
+    else:
+        prologue, epilogue = lines, []
+    while prologue and not prologue[-1].strip():
+        prologue.pop()
+    while epilogue and not epilogue[0].strip():
+        epilogue.pop(0)
+
+    groups = {}
+    for word in words:
+        groups.setdefault(word[0].upper(), []).append(word)
+    out = prologue + ['']
+    for letter, group in groups.items():
+        out += [f"## {letter}", ", ".join(group), '']
+    out += epilogue
+    return '\n'.join(out).rstrip('\n') + '\n'
+
+
+def load_store(name):
+    return WordList(load_word_list(name))
+
+
+def save_store(name, store):
+    """Write a list back in its own format. Returns the write status."""
+    path = WORD_LIST_PATHS[name]
+    if path.endswith('.md'):
+        with open(path, 'r', encoding='utf-8') as f:
+            text = render_sight_words(store.words, f.read())
+    else:
+        text = render_word_file(store.words)
+    return write_if_changed(path, text)
+
+
+def read_import(path):
+    """Yield the words of an import file (one per line or comma-separated)."""
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for line in f:
+            yield from line.split(',')
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def cross_duplicates(stores):
+    """{(list a, list b): [words in both]} for every pair of lists."""
+    found = {}
+    for (a, store_a), (b, store_b) in combinations(stores.items(), 2):
+        small, large = sorted((store_a, store_b), key=len)
+        common = [word for word in small if word in large]
+        if common:
+            found[(a, b)] = common
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sorted, deduplicated word-list store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    normalize = sub.add_parser("normalize", help="sort and dedupe lists in place")
+    normalize.add_argument("lists", nargs="*", metavar="LIST",
+                           help=f"lists to normalize (default: all of {', '.join(WORD_LIST_PATHS)})")
+    normalize.add_argument("--dry-run", action="store_true")
+
+    bulk = sub.add_parser("import", help="merge words from files into a list")
+    bulk.add_argument("list", choices=list(WORD_LIST_PATHS))
+    bulk.add_argument("files", nargs="+", help="word files ('-' for stdin)")
+    bulk.add_argument("--keep-case", action="store_true",
+                      help="do not lower-case imported words")
+    bulk.add_argument("--dry-run", action="store_true")
+
+    check = sub.add_parser("check", help="show which lists contain each word")
+    check.add_argument("words", nargs="+")
+
+    dupes = sub.add_parser("duplicates", help="report words that are in more than one list")
+    dupes.add_argument("--lists", default=None, help="comma-separated lists to compare")
+    dupes.add_argument("--show", type=int, default=20, help="words to print per pair")
+    args = parser.parse_args()
+
+    if args.command == "normalize":
+        unknown = [name for name in args.lists if name not in WORD_LIST_PATHS]
+        if unknown:
+            parser.error(f"unknown list(s): {', '.join(unknown)}")
+        for name in args.lists or WORD_LIST_PATHS:
+            before = len(load_word_list(name))
+            store = load_store(name)
+            status = "would write" if args.dry_run else save_store(name, store)
+            print(f"{name}: {len(store)} words ({before - len(store)} duplicates removed), "
+                  f"{status}")
+
+    elif args.command == "import":
+        store = load_store(args.list)
+        before = len(store)
+        words = (w for path in args.files for w in read_import(path))
+        if not args.keep_case:
+            words = (w.lower() for w in words)
+        added = store.merge(words)
+        status = "would write" if args.dry_run else save_store(args.list, store)
+        print(f"{args.list}: {added} new words, {before} -> {len(store)} ({status})")
+
+    elif args.command == "check":
+        stores = {name: load_store(name) for name in WORD_LIST_PATHS}
+        for word in args.words:
+            lists = [name for name, store in stores.items() if word in store]
+            print(f"{word}: {', '.join(lists) if lists else 'not in any list'}")
+
+    elif args.command == "duplicates":
+        names = args.lists.split(",") if args.lists else list(WORD_LIST_PATHS)
+        stores = {name: load_store(name) for name in names}
+        for (a, b), common in cross_duplicates(stores).items():
+            shown = ", ".join(common[:args.show])
+            more = f", ... (+{len(common) - args.show})" if len(common) > args.show else ""
+            print(f"{a} & {b}: {len(common)} words: {shown}{more}")
+
+
+if __name__ == '__main__':
+    main()